@@ -1,31 +1,215 @@
-from models.order import Order, OrderItem
+from models.order import Order, OrderItem, DATE_FORMAT, ORDER_STATUSES, CONFIRMED, PAYMENT_PENDING, PAYMENT_FAILED, UNSETTLED
+from models.inventory import OutOfStock, reserve_stock, release_stock, set_stock
 from models.user import db, User
-from models.product import PhysicalProduct, DigitalProduct, SubscriptionProduct
-from models.payment import CreditCard, PayPal, Bitcoin, BankTransfer
+from models.db_profile import init_database, read_only_view
+from models.user_cache import UserCache, UserSnapshot
+from models.password_pool import PasswordHasher, HashingBusy
+from models.throttle import Throttle
+from models.catalog import CatalogManager
+from models.catalog_file import write_catalog_file
+from models.payment import PaymentError, PaymentDeclined, PaymentTimeout, create_gateways
 from models.cart import Cart
+from models.pricing import format_cents
+from models.cart_store import create_cart_store
+from models.invoice import InvoiceCache, style_sheet
+from models.images import ImagePipeline
+from models.fragment_cache import FragmentCache
+from models.metrics import Metrics
+from models.jobs import JobQueue
+from models.tracking import TrackingCache
+from models.bulk_orders import bulk_update_status, bulk_delete, import_statuses, settled
+from models.rollups import (
+    DailyRevenue, ProductSales, StatusTotals, add_orders, move_status, status_moved, remove_orders, rebuild
+)
+from models.recommendations import CoPurchase, Recommendations, add_basket, remove_baskets, rebuild_co_purchases
+from models.order_export import export_rows, to_csv, to_ndjson, gzip_chunks
+from models.serializers import (
+    PRODUCT_FIELDS, ORDER_FIELDS, ITEM_FIELDS, parse_fields, encode_cursor, decode_cursor,
+    product_to_dict, order_to_dict, stream_page
+)
+from models.factory import Views, Subsystems, subsystem
 from functools import wraps
-from flask import Flask, render_template, request, redirect, url_for, flash, send_file, abort
+from flask import Flask, current_app, has_app_context, render_template, request, redirect, url_for, flash, send_file, send_from_directory, abort, g, make_response, session, jsonify, Response, stream_with_context
 from flask_login import LoginManager, login_user, login_required, logout_user, current_user
-import json
-from math import ceil
-from datetime import datetime, timedelta
+from werkzeug.local import LocalProxy
+import gc
+import hashlib
+import os
+import time
+from uuid import uuid4
+import click
+from datetime import date, datetime, timedelta
 from config import Config
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet
-from decimal import Decimal, ROUND_HALF_UP
+from io import BytesIO, TextIOWrapper
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import joinedload, load_only, selectinload
+
+
+# ---------- App factory ----------
+
+class Services(Subsystems):
+    """Per-app subsystems. Each one is built when first used, so starting
+    the app reads no catalog, imports no ReportLab and starts no pools.
+
+    Views reach them through the module-level proxies below.
+    """
+
+    def __init__(self, app):
+        super().__init__()
+        self.config = app.config
+        self.root_path = app.root_path
+        self.instance_path = app.instance_path
+        self.static_folder = app.static_folder
+
+        # Request latency and SQL statistics, served at /admin/metrics
+        self.metrics = Metrics(app.config["METRICS_N_PLUS_ONE_THRESHOLD"])
+        self.metrics.gauge("user_cache_hit_ratio", "Share of user lookups served from the cache.",
+                           lambda: self.user_cache.hit_rate)
+        self.metrics.gauge("jobs_pending", "Background jobs waiting to run.",
+                           lambda: jobs.counts().get("pending", 0))
+        self.metrics.gauge("jobs_dead", "Background jobs that failed every attempt.",
+                           lambda: jobs.counts().get("dead", 0))
+
+    @subsystem
+    def catalog(self):
+        # Reloaded in the background when products.json changes
+        return CatalogManager(
+            os.path.join(self.root_path, self.config["CATALOG_PATH"]),
+            check_interval=self.config["CATALOG_CHECK_INTERVAL"]
+        )
+
+    @subsystem
+    def payments(self):
+        return create_gateways(self.config)
+
+    @subsystem
+    def cart_store(self):
+        return create_cart_store(self.config, self.instance_path)
+
+    @subsystem
+    def invoice_cache(self):
+        return InvoiceCache(self.config["INVOICE_CACHE_BYTES"])
+
+    @subsystem
+    def fragment_cache(self):
+        return FragmentCache(self.config["FRAGMENT_CACHE_SIZE"])
+
+    @subsystem
+    def tracking_cache(self):
+        return TrackingCache(self.config["TRACKING_CACHE_SIZE"], self.config["TRACKING_CACHE_TTL"])
+
+    @subsystem
+    def image_pipeline(self):
+        return ImagePipeline(
+            os.path.join(self.static_folder, "images"),
+            os.path.join(self.root_path, self.config["IMAGE_DERIVATIVES_DIR"])
+        )
+
+    @subsystem
+    def user_cache(self):
+        return UserCache(self.config["USER_CACHE_SIZE"], self.config["USER_CACHE_TTL"])
+
+    @subsystem
+    def password_hasher(self):
+        # Hashing runs in a process pool, itself started on first use
+        return PasswordHasher(
+            self.config["PASSWORD_HASH_WORKERS"],
+            self.config["PASSWORD_HASH_QUEUE"],
+            self.config["PASSWORD_HASH_TIMEOUT"]
+        )
+
+    @subsystem
+    def recommendations(self):
+        return Recommendations(
+            self.config["RECOMMENDATIONS_TOP_K"],
+            self.config["RECOMMENDATIONS_CACHE_SIZE"],
+            self.config["RECOMMENDATIONS_TTL"]
+        )
+
+    @subsystem
+    def login_ip_throttle(self):
+        return Throttle(*self.config["LOGIN_RATE_PER_IP"])
 
+    @subsystem
+    def login_username_throttle(self):
+        return Throttle(*self.config["LOGIN_RATE_PER_USERNAME"])
 
-app = Flask(__name__)
-app.config.from_object(Config)
 
-db.init_app(app)
+def service(name):
+    return LocalProxy(lambda: getattr(current_app.extensions["store"], name))
 
-login_manager = LoginManager(app)
+
+metrics = service("metrics")
+catalog = service("catalog")
+payments = service("payments")
+cart_store = service("cart_store")
+invoice_cache = service("invoice_cache")
+fragment_cache = service("fragment_cache")
+tracking_cache = service("tracking_cache")
+image_pipeline = service("image_pipeline")
+recommendations = service("recommendations")
+user_cache = service("user_cache")
+password_hasher = service("password_hasher")
+login_ip_throttle = service("login_ip_throttle")
+login_username_throttle = service("login_username_throttle")
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def drop_cached_user(mapper, connection, target):
+    # Registered once for all apps, on the shared User mapper; the entry
+    # goes from the cache of the app the change is made in
+    if has_app_context():
+        user_cache.invalidate(target.id)
+
+views = Views()
+
+login_manager = LoginManager()
 login_manager.login_view = "login"
 
-cart = Cart()
+# Post-checkout work, run by background workers (see models/jobs.py)
+jobs = JobQueue()
+
+
+def create_app(config=Config):
+    app = Flask(__name__)
+    app.config.from_object(config)
+
+    init_database(app, db)
+    login_manager.init_app(app)
+    jobs.init_app(app)
+
+    services = Services(app)
+    app.extensions["store"] = services
+    with app.app_context():
+        services.metrics.instrument(app, db.engines.values())
+
+    views.register(app)
+
+    if app.config["PRELOAD"]:
+        warm_up(app)
+    return app
+
+
+def warm_up(app):
+    """Build the subsystems a request needs now rather than on first use.
+
+    Meant for a preloading server (e.g. gunicorn --preload): done in the
+    master process before it forks, every worker starts warm and shares
+    these pages copy-on-write. Nothing that holds threads, processes or
+    database connections is started here; those start per worker.
+    """
+    services = app.extensions["store"]
+    with app.app_context():
+        services.build_all()
+        services.catalog.current  # parses products.json (or maps the .bin file)
+        style_sheet()  # imports ReportLab
+        for name in app.jinja_env.list_templates():
+            app.jinja_env.get_template(name)
+    # Keep the garbage collector from writing to (and so un-sharing) them
+    gc.freeze()
+
 
 def admin_required(func):
     @wraps(func)
@@ -38,51 +222,80 @@ def admin_required(func):
     return wrapper
 
 
+def load_user_snapshot(user_id):
+    row = db.session.execute(
+        select(User.id, User.username, User.is_admin).where(User.id == user_id)
+    ).first()
+    return UserSnapshot(*row) if row else None
+
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
-
-# Load products
-def load_products():
-    with open("products.json") as f:
-        data = json.load(f)
-
-    product_objects = {}
-    for p in data:
-        rating = p.get("rating", 0)  # default 0 if not set
-        if p["type"] == "physical":
-            obj = PhysicalProduct(p["id"], p["name"], p["price"], p["image"])
-        elif p["type"] == "digital":
-            obj = DigitalProduct(p["id"], p["name"], p["price"], p["image"])
+    # Served from memory on most requests; see models/user_cache.py
+    return user_cache.get(int(user_id), load_user_snapshot)
+
+
+def current_catalog():
+    # Pin one snapshot per request so a reload never changes it mid-request
+    if "catalog" not in g:
+        g.catalog = catalog.current
+    return g.catalog
+
+
+def get_cart():
+    # One cart per user, loaded from the cart store once per request
+    if "cart" not in g:
+        if current_user.is_authenticated:
+            g.cart = Cart.load(cart_store, current_user.get_id(), current_catalog().products)
         else:
-            obj = SubscriptionProduct(p["id"], p["name"], p["price"], p["image"])
+            g.cart = Cart()
+    return g.cart
+
+
+# ---------- Conditional GET ----------
+
+def page_etag(*parts):
+    # Everything a catalog page shows: its own parts, the catalog
+    # version, and the per-user navbar (login, admin flag, cart)
+    cart_state = sorted((product_id, item["qty"]) for product_id, item in get_cart().items.items())
+    if current_user.is_authenticated:
+        user = (current_user.get_id(), current_user.username, current_user.is_admin)
+    else:
+        user = None
+    raw = repr((parts, current_catalog().version, user, cart_state))
+    return hashlib.sha1(raw.encode()).hexdigest()
+
 
-        obj.rating = rating
-        product_objects[p["id"]] = obj
+def is_not_modified(etag):
+    # A pending flash message has to be shown, so always render then
+    return "_flashes" not in session and request.if_none_match.contains(etag)
 
-    return product_objects
 
+def not_modified(etag):
+    response = make_response("", 304)
+    return with_etag(response, etag)
 
-products = load_products()
 
-payments = {
-    "credit/debit card": CreditCard(),
-    "paypal": PayPal(),
-    "bitcoin": Bitcoin(),
-    "bank transfer": BankTransfer()
-}
+def with_etag(response, etag, private=True):
+    response.set_etag(etag)
+    # Browsers (and, for public data, shared caches) may keep the
+    # response but must revalidate it each time
+    if private:
+        response.cache_control.private = True
+    else:
+        response.cache_control.public = True
+    response.cache_control.no_cache = True
+    return response
 
 
-@app.route("/")
-@app.route("/page/<int:page>")
+@views.route("/")
+@views.route("/page/<int:page>")
+@read_only_view
 def index(page=1):
     per_page = 6  # 2 rows × 3 cols
-    all_products = list(products.values())
-    total_pages = ceil(len(all_products) / per_page)
-    
-    start = (page - 1) * per_page
-    end = start + per_page
-    page_products = all_products[start:end]
+    page = max(page, 1)
+
+    query_args = {key: value for key, value in request.args.items() if value and key != "page"}
 
     # Determine greeting based on time
     hour = datetime.now().hour
@@ -101,43 +314,154 @@ def index(page=1):
 
     full_greeting = f"{greeting}, {name.title()}!"
 
-    return render_template(
+    etag = page_etag("index", page, sorted(query_args.items()), full_greeting)
+    if is_not_modified(etag):
+        return not_modified(etag)
+
+    def render_grid():
+        # Search / filter / sort through the catalog index
+        page_products, has_next = current_catalog().index.search(
+            q=request.args.get("q", "").strip(),
+            kind=request.args.get("type") or None,
+            min_price=request.args.get("min_price", type=float),
+            max_price=request.args.get("max_price", type=float),
+            min_rating=request.args.get("min_rating", type=int),
+            sort=request.args.get("sort", "default"),
+            offset=(page - 1) * per_page,
+            limit=per_page
+        )
+        return render_template(
+            "_product_grid.html",
+            products=page_products,
+            page=page,
+            has_next=has_next,
+            query_args=query_args
+        )
+
+    # The grid only varies with these; greeting and navbar stay per user
+    grid_key = (
+        "grid", current_catalog().version, page, tuple(sorted(query_args.items())),
+        current_user.is_authenticated, bool(get_cart().items)
+    )
+
+    response = make_response(render_template(
         "index.html",
-        products=page_products,
-        page=page,
-        cart=cart,
-        total_pages=total_pages,
+        product_grid=fragment_cache.get_or_render(grid_key, render_grid),
+        cart=get_cart(),
+        query_args=query_args,
+        product_types=current_catalog().index.types,
         greeting=full_greeting,
         name=name
-    )
+    ))
+    return with_etag(response, etag)
 
 
-@app.context_processor
+@views.context_processor
 def inject_cart():
-    return dict(cart=cart)
+    return dict(cart=get_cart())
+
+
+@views.template_global()
+def image_url(filename, size, fmt="jpeg"):
+    # Resized copy of a product image; falls back to the original file
+    try:
+        name = image_pipeline.derivative(filename, size, fmt)
+    except OSError:
+        return url_for("static", filename="images/" + (filename or "placeholder.png"))
+    return url_for("product_image", filename=name)
+
+
+@views.template_filter("money")
+def format_money(cents):
+    return format_cents(cents)
+
+
+@views.template_filter("date")
+def format_date(value):
+    return value.strftime(DATE_FORMAT) if value else ""
+
+
+@views.route("/media/<path:filename>")
+def product_image(filename):
+    # Names are content-hashed, so browsers may keep them forever
+    response = send_from_directory(
+        image_pipeline.output_dir, filename, max_age=current_app.config["IMAGE_MAX_AGE"]
+    )
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+@views.cli.command("build-images")
+def build_images():
+    """Pre-build resized product images for every catalog entry."""
+    built = image_pipeline.build_all(p.image for p in catalog.current.product_list)
+    click.echo(f"{len(built)} image derivatives ready in {image_pipeline.output_dir}")
+
 
+@views.cli.command("build-catalog")
+@click.argument("output", default="products.bin")
+def build_catalog(output):
+    """Convert products.json to the memory-mapped catalog format.
 
-@app.route("/product/<int:product_id>")
+    Point CATALOG_PATH at the output to have workers share one copy.
+    """
+    count = write_catalog_file(os.path.join(current_app.root_path, "products.json"), output)
+    click.echo(f"Wrote {count} products to {output}")
+
+
+@views.cli.command("set-stock")
+@click.argument("quantity", type=int)
+@click.argument("product_ids", type=int, nargs=-1)
+def set_stock_command(quantity, product_ids):
+    """Set the stock level of PRODUCT_IDS (default: every catalog product)."""
+    product_ids = product_ids or list(catalog.current.products)
+    for product_id in product_ids:
+        set_stock(product_id, quantity)
+    db.session.commit()
+    click.echo(f"Stock set to {quantity} for {len(product_ids)} products")
+
+
+@views.route("/product/<int:product_id>")
+@read_only_view
 def product_detail(product_id):
+    products = current_catalog().products
     product = products.get(product_id)
 
     if not product:
         abort(404)
 
-    return render_template(
-        "product_detail.html",
-        product=product,
-        cart=cart
+    # From memory on most views; ids no longer in the catalog are skipped
+    recommended = [
+        products[other_id] for other_id in recommendations.get(product_id) if other_id in products
+    ][:current_app.config["RECOMMENDATIONS_SHOWN"]]
+
+    etag = page_etag("product", product_id, [p.id for p in recommended])
+    if is_not_modified(etag):
+        return not_modified(etag)
+
+    body_key = ("detail", current_catalog().version, product_id, bool(get_cart().items))
+    product_body = fragment_cache.get_or_render(
+        body_key,
+        lambda: render_template("_product_detail.html", product=product, cart=get_cart())
     )
 
+    response = make_response(render_template(
+        "product_detail.html",
+        product_body=product_body,
+        recommended=recommended,
+        cart=get_cart()
+    ))
+    return with_etag(response, etag)
+
 
 
-@app.route("/adds/<int:product_id>")
+@views.route("/adds/<int:product_id>")
 @login_required
 def add_to_cart_s(product_id):
-    product = products.get(product_id)
+    product = current_catalog().products.get(product_id)
     if product:
-        cart.add(product)
+        get_cart().add(product)
         flash(f"'{product.name}' added to cart.", "success")
     else:
         #flash("Product not found.")
@@ -145,14 +469,14 @@ def add_to_cart_s(product_id):
     return redirect(url_for("product_detail", product_id=product_id))
 
 
-@app.route("/add/<int:product_id>", methods=["POST"])
+@views.route("/add/<int:product_id>", methods=["POST"])
 @login_required
 def add_to_cart(product_id):
-    product = products.get(product_id)
+    product = current_catalog().products.get(product_id)
 
     if product:
         quantity = int(request.form.get("quantity", 1))
-        cart.add(product, quantity)
+        get_cart().add(product, quantity)
         flash(f"{product.name} (x{quantity}) added to cart.")
     else:
         flash("Product not found.")
@@ -163,27 +487,26 @@ def add_to_cart(product_id):
 
 # ---------- Cart routes ----------
 
-@app.route("/cart")
+@views.route("/cart")
 @login_required
 def view_cart():
-	global vat, grand_total
-	
-	total=cart.total()
-	vat = round(total * 0.1, 2)
-	grand_total = round(total + vat, 2)
+	cart = get_cart()
+	totals = cart.totals()  # cents, kept up to date by the cart itself
 
 	return render_template(
 		"cart.html",
 		items=cart.list_items(),
-		total=round(total, 2),
-		vat=vat,
-		grand_total=grand_total
+		total=totals.subtotal,
+		vat=totals.vat,
+		grand_total=totals.total,
+		checkout_key=uuid4().hex  # idempotency key for this checkout attempt
 	)
 
 
-@app.route("/cart", methods=["POST"])
+@views.route("/cart", methods=["POST"])
 @login_required
 def checkout_cart():
+    cart = get_cart()
     if not cart.items:
         flash("Your cart is empty!")
         return redirect(url_for("index"))
@@ -206,13 +529,32 @@ def checkout_cart():
         flash("Please fill all shipment details")
         return redirect(url_for("view_cart"))
 
-    # Process payment
-    total_amount = cart.total()
-    payment.pay(total_amount)
-    
+    # A resubmitted form carries the same key: show the order it created
+    checkout_key = request.form.get("checkout_key") or uuid4().hex
+    existing = Order.query.filter_by(payment_key=checkout_key, user_id=current_user.id).first()
+    if existing:
+        return redirect(url_for("order_success", order_id=existing.id))
+
+    totals = cart.totals()
+    total_amount = totals.subtotal / 100
+
     # Order/Delivery date
-    order_date = datetime.now().strftime("%d-%m-%Y")
-    delivery_date = (datetime.now() + timedelta(days=3)).strftime("%d-%m-%Y")
+    order_date = date.today()
+    delivery_date = order_date + timedelta(days=3)
+
+    # Reserve stock first: conditional decrements, rolled back on failure.
+    # From here to the commit this request holds the database's write
+    # lock, so everything it needs is worked out above
+    quantities = {product_id: item["qty"] for product_id, item in cart.items.items()}
+    try:
+        reserve_stock(quantities)
+    except OutOfStock as e:
+        db.session.rollback()
+        names = ", ".join(
+            cart.items[product_id]["product"].name for product_id in e.product_ids
+        )
+        flash(f"Sorry, not enough stock left for: {names}")
+        return redirect(url_for("view_cart"))
 
     # Create Order
     new_order = Order(
@@ -226,184 +568,319 @@ def checkout_cart():
         payment_method=payment_method,
         delivery_date=delivery_date,
         total=total_amount,
+        subtotal_cents=totals.subtotal,
+        vat_cents=totals.vat,
+        total_cents=totals.total,
+        payment_key=checkout_key,
+        status=PAYMENT_PENDING,  # until the payment's outcome is recorded
     )
 
     db.session.add(new_order)
-    
-    for item in cart.items.values():
-        product = item["product"]
-
-        order_item = OrderItem(
-            order=new_order,
-            product_name=product.name,
-            price=product.price,
-            quantity=item["qty"],
-            product_image=product.image  # ← save image filename
-        )
-        db.session.add(order_item)
-
+    db.session.flush()  # assigns new_order.id
+
+    # All items in one executemany INSERT
+    db.session.execute(insert(OrderItem), [
+        {
+            "order_id": new_order.id,
+            "product_id": product_id,
+            "product_name": item["product"].name,
+            "price": item["product"].price,
+            "quantity": item["qty"],
+            "product_image": item["product"].image  # ← save image filename
+        }
+        for product_id, item in cart.items.items()
+    ])
+    add_orders([new_order.id])
+    bought_together = add_basket(cart.items)
+    # Settles the order later if its payment outcome never gets recorded
+    # below (say this process dies while waiting on the gateway)
+    jobs.enqueue(
+        "reconcile_payment", {"order_id": new_order.id, "payment": payment_key},
+        delay=current_app.config["PAYMENT_RECONCILE_AFTER"]
+    )
 
-    # Commit everything at once
-    db.session.commit()
+    # Commit everything at once, before the (slow) payment call
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # The same checkout was submitted twice concurrently
+        db.session.rollback()
+        existing = Order.query.filter_by(payment_key=checkout_key).first_or_404()
+        return redirect(url_for("order_success", order_id=existing.id))
+
+    # Process payment on the gateway's executor, with its timeout
+    order_id = new_order.id
+    try:
+        payment.pay(total_amount, idempotency_key=checkout_key)
+    except PaymentTimeout as e:
+        # Outcome unknown: the stock stays held and the order pending
+        # until the call finishes, whichever way it goes
+        app = current_app._get_current_object()
+        e.future.add_done_callback(lambda future: settle_payment_later(app, order_id, future))
+        flash("Your payment is still being processed. We'll confirm the order as soon as it goes through.")
+    except Exception as e:
+        # Declined, gateway unavailable or broken: undo the order and give the stock back
+        db.session.rollback()
+        settle_payment(order_id, paid=False)
+        if not isinstance(e, PaymentError):
+            raise
+        flash(f"Payment failed: {e}")
+        return redirect(url_for("view_cart"))
+    else:
+        try:
+            settle_payment(order_id, paid=True)
+        except SQLAlchemyError:
+            # The customer has been charged, so the checkout must not fail
+            # now: the order stays pending and reconcile_payment confirms it
+            db.session.rollback()
+            current_app.logger.exception("Could not confirm the paid order %s", order_id)
+    recommendations.invalidate(bought_together)
 
     # Clear cart
     cart.clear()
 
-    return redirect(url_for("order_success", order_id=new_order.id))
-    
+    return redirect(url_for("order_success", order_id=order_id))
+
+
+def settle_payment(order_id, paid):
+    """Record the outcome of a pending order's payment and commit.
+
+    Paid orders are confirmed; otherwise the stock is given back and the
+    order deleted. The order is claimed with a conditional UPDATE, so of
+    the request, a late gateway callback and the reconcile job, only the
+    first to settle it does anything. Returns whether this call did.
+    """
+    status = CONFIRMED if paid else PAYMENT_FAILED
+    claimed = db.session.execute(
+        update(Order)
+        .where(Order.id == order_id, Order.status == PAYMENT_PENDING)
+        .values(status=status)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not claimed:
+        db.session.rollback()
+        return False
+    status_moved([order_id], PAYMENT_PENDING)
+
+    if paid:
+        enqueue_order_jobs(order_id)
+    else:
+        release_stock(order_quantities(order_id))
+        bulk_delete([order_id])
+    db.session.commit()
+
+    if paid:
+        jobs.wake()
+        tracking_cache.update_status(order_id, status)
+    else:
+        tracking_cache.invalidate(order_id)
+    return True
+
+
+def order_quantities(order_id):
+    # {product_id: qty} as reserved at checkout
+    return dict(db.session.execute(
+        select(OrderItem.product_id, OrderItem.quantity)
+        .where(OrderItem.order_id == order_id, OrderItem.product_id.is_not(None))
+    ).all())
+
+
+def settle_payment_later(app, order_id, future):
+    # Done-callback of a payment call that outlived its request
+    try:
+        with app.app_context():
+            settle_payment(order_id, paid=future.exception() is None)
+    except Exception:
+        # The reconcile job settles it instead
+        app.logger.exception("Could not settle the payment of order %s", order_id)
+
+
+# ---------- Background jobs ----------
+
+def enqueue_order_jobs(order_id):
+    # Only from settle_payment(), so the jobs commit in the same
+    # transaction that confirms the order: a confirmed order always has
+    # them. If this process dies before then, the reconcile_payment job
+    # committed with the order confirms it later and enqueues them.
+    jobs.enqueue("deliver_order", {"order_id": order_id, "products": order_quantities(order_id)})
+    jobs.enqueue("send_confirmation", {"order_id": order_id})
+    jobs.enqueue("render_invoice", {"order_id": order_id})
+
+
+@jobs.task("reconcile_payment")
+def reconcile_payment(payload):
+    order = db.session.get(Order, payload["order_id"])
+    if order is None or order.status != PAYMENT_PENDING:
+        return  # settled already
+    # Same idempotency key as the checkout: in the same process this
+    # waits on the original call; in another it relies on the gateway
+    # honouring the key. Timeouts and an open breaker raise, and the
+    # job is retried later.
+    try:
+        payments[payload["payment"]].pay(order.total, idempotency_key=order.payment_key)
+    except PaymentDeclined:
+        settle_payment(order.id, paid=False)
+    else:
+        settle_payment(order.id, paid=True)
+
+
+@jobs.task("deliver_order")
+def deliver_order(payload):
+    products = catalog.current.products
+    for product_id, qty in payload["products"].items():
+        product = products.get(int(product_id))
+        if product is None:
+            raise LookupError(f"Product {product_id} is no longer in the catalog")
+        current_app.logger.info("Order %s: %s (x%d)", payload["order_id"], product.deliver(), qty)
+
+
+@jobs.task("send_confirmation")
+def send_confirmation(payload):
+    order = db.session.get(Order, payload["order_id"])
+    if order is None:
+        return  # deleted in the meantime
+    user = db.session.get(User, order.user_id) if order.user_id is not None else None
+    if user is None:
+        current_app.logger.warning("Order %s has no user to confirm to, skipped", order.id)
+        return
+    # No mail backend yet: the message goes to the log
+    current_app.logger.info(
+        "Confirmation for order %s to %s: %s due %s",
+        order.id, user.username, format_cents(order.total_cents), f"{order.delivery_date:{DATE_FORMAT}}"
+    )
+
+
+@jobs.task("render_invoice")
+def prerender_invoice(payload):
+    # Warm the cache so the first invoice download is instant
+    order = db.session.get(Order, payload["order_id"])
+    if order is not None:
+        invoice_cache.get_or_render(order)
+
+
+@views.cli.command("run-jobs")
+def run_jobs():
+    """Run background jobs in this process until interrupted (for JOB_WORKERS=0)."""
+    db.create_all()  # creates the jobs table on older databases
+    click.echo("Running background jobs, Ctrl+C to stop")
+    while True:
+        if not jobs.run_one():
+            time.sleep(current_app.config["JOB_POLL_INTERVAL"])
 
-@app.route("/success/<int:order_id>")
+
+@views.cli.command("requeue-dead-jobs")
+def requeue_dead_jobs():
+    """Give jobs that failed every attempt another round."""
+    count = jobs.requeue_dead()
+    db.session.commit()
+    click.echo(f"{count} jobs requeued")
+
+
+@views.route("/success/<int:order_id>")
 @login_required
 def order_success(order_id):
     order = Order.query.get_or_404(order_id)
 
-    # Calculate subtotal
-    subtotal = sum(item.price * item.quantity for item in order.items)
-
-    # VAT and total
-    vat = round(subtotal * 0.1, 2)
-    grand_total = round(subtotal + vat, 2)
-
+    # Totals were fixed at checkout; never recompute them here
     return render_template(
         "success.html",
         order=order,
-        total=round(subtotal, 2),
-        vat=vat,
-        grand_total=grand_total
+        total=order.subtotal_cents,
+        vat=order.vat_cents,
+        grand_total=order.total_cents
     )
 
 
-@app.route("/track", methods=["GET", "POST"])
+@views.route("/track", methods=["GET", "POST"])
+@read_only_view
 def track_order():
     order = None
     if request.method == "POST":
-        order_id = request.form.get("order_id")
-        order = Order.query.get(order_id)
-        
+        order_id = request.form.get("order_id", type=int)
+        if order_id is not None:
+            order = tracking_cache.get(order_id)
+
     return render_template("track.html", order=order)
 
 
-@app.route("/cart/delete/<int:product_id>")
+@views.route("/track/batch", methods=["POST"])
+@read_only_view
+def track_orders_batch():
+    # For courier integrations: {"order_ids": [...]} in, statuses out
+    data = request.get_json(silent=True) or {}
+    order_ids = data.get("order_ids")
+    if not isinstance(order_ids, list) or not all(isinstance(i, int) for i in order_ids):
+        return jsonify(error="Expected {\"order_ids\": [<int>, ...]}"), 400
+    order_ids = list(dict.fromkeys(order_ids))
+    if len(order_ids) > current_app.config["TRACKING_BATCH_MAX"]:
+        return jsonify(error=f"At most {current_app.config['TRACKING_BATCH_MAX']} order ids per request"), 400
+
+    found = tracking_cache.get_many(order_ids)
+    return jsonify(
+        orders=[
+            {
+                "id": info.id,
+                "status": info.status,
+                "delivery_company": info.delivery_company,
+                "delivery_date": info.delivery_date.isoformat() if info.delivery_date else None,
+            }
+            for info in (found[order_id] for order_id in order_ids if order_id in found)
+        ],
+        not_found=[order_id for order_id in order_ids if order_id not in found]
+    )
+
+
+@views.route("/cart/delete/<int:product_id>")
 @login_required
 def delete_from_cart(product_id):
-    cart.remove(product_id)
+    get_cart().remove(product_id)
     flash("Item removed from cart.")
     return redirect(url_for("view_cart"))
 
 
-@app.route("/cart/increase/<int:product_id>")
+@views.route("/cart/increase/<int:product_id>")
 @login_required
 def increase_qty(product_id):
-    cart.increase(product_id)
+    get_cart().increase(product_id)
     return redirect(url_for("view_cart"))
 
 
-@app.route("/cart/decrease/<int:product_id>")
+@views.route("/cart/decrease/<int:product_id>")
 @login_required
 def decrease_qty(product_id):
-    cart.decrease(product_id)
+    get_cart().decrease(product_id)
     return redirect(url_for("view_cart"))
 
 
-@app.route("/invoice/<int:order_id>")
+@views.route("/invoice/<int:order_id>")
 @login_required
 def generate_invoice(order_id):
     order = Order.query.get_or_404(order_id)
 
-    file_path = f"invoice_{order_id}.pdf"
-
-    doc = SimpleDocTemplate(file_path, pagesize=letter)
-    styles = getSampleStyleSheet()
-    elements = []
-
-    # --- Store Info ---
-    elements.append(Paragraph("<b>Mini Store</b><sup>™</sup>", styles["Title"]))
-    elements.append(Paragraph("123 Commerce Street", styles["Normal"]))
-    elements.append(Paragraph("Berlin, Germany", styles["Normal"]))
-    elements.append(Paragraph("Email: support@ministore.com", styles["Normal"]))
-    elements.append(Spacer(1, 15))
-
-    # --- Invoice Header ---
-    elements.append(Paragraph(f"<b>Invoice</b>", styles["Heading1"]))
-    elements.append(Paragraph(f"Invoice Number: {order.id}", styles["Normal"]))
-    elements.append(Paragraph(f"Order Date: {order.order_date}", styles["Normal"]))
-    elements.append(Spacer(1, 10))
-
-    # --- Customer / Shipping ---
-    elements.append(Paragraph("<b>Bill To:</b>", styles["Heading3"]))
-    elements.append(Paragraph(order.address, styles["Normal"]))
-    elements.append(Paragraph(f"{order.city}, {order.zip_code}", styles["Normal"]))
-    elements.append(Paragraph(order.country, styles["Normal"]))
-    elements.append(Spacer(1, 15))
-
-    # --- Item Table ---
-    table_data = [
-        ["Item", "Qty", "Unit Price (€)", "Total (€)"]
-    ]
-
-    subtotal = Decimal("0.00")
-
-    for item in order.items:
-        unit_price = Decimal(str(item.price))
-        quantity = Decimal(str(item.quantity))
-        line_total = unit_price * quantity
-        subtotal += line_total
-
-        table_data.append([
-            item.product_name,
-            str(item.quantity),
-            f"{unit_price:.2f}",
-            f"{line_total:.2f}"
-        ])
-
-    vat = (subtotal * Decimal("0.1")).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-    grand_total = (subtotal + vat).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-
-    # --- Totals rows ---
-    table_data.append(["", "", "Subtotal:", f"{subtotal:.2f}"])
-    table_data.append(["", "", "VAT (10%):", f"{vat:.2f}"])
-    table_data.append(["", "", "Total:", f"{grand_total:.2f}"])
-
-    table = Table(table_data, colWidths=[220, 60, 100, 100])
-    table.setStyle(TableStyle([
-        ("BACKGROUND", (0, 0), (-1, 0), colors.grey),
-        ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke),
-        ("GRID", (0, 0), (-1, -1), 1, colors.black),
-        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-        ("ALIGN", (1, 1), (-1, -1), "CENTER"),
-        ("ALIGN", (2, 1), (-1, -1), "RIGHT"),
-        ("BACKGROUND", (0, -1), (-1, -1), colors.lightgrey),
-        ("FONTNAME", (0, -1), (-1, -1), "Helvetica-Bold"),
-    ]))
-
-    elements.append(table)
-    elements.append(Spacer(1, 20))
-
-    # --- Payment & Delivery ---
-    elements.append(Paragraph(f"<b>Payment Method:</b> {order.payment_method}", styles["Normal"]))
-    elements.append(Paragraph(f"<b>Delivery Company:</b> {order.delivery_company}", styles["Normal"]))
-    elements.append(Spacer(1, 15))
-
-    # --- Footer ---
-    elements.append(Paragraph(
-        "Thank you for shopping with Mini Store.",
-        styles["Italic"]
-    ))
-
-    doc.build(elements)
+    # Rendered in memory; repeated downloads are served from the cache
+    pdf = invoice_cache.get_or_render(order)
 
-    return send_file(file_path, as_attachment=True)
+    return send_file(
+        BytesIO(pdf),
+        mimetype="application/pdf",
+        as_attachment=True,
+        download_name=f"invoice_{order_id}.pdf"
+    )
 
 
 # ---------- Auth ----------
-@app.route("/register", methods=["GET", "POST"])
+@views.route("/register", methods=["GET", "POST"])
 def register():
     if request.method == "POST":
         username = request.form["username"]
         password = request.form["password"]
 
         user = User(username=username)
-        user.set_password(password)
+        try:
+            user.password_hash = password_hasher.hash(password)
+        except HashingBusy:
+            flash("We're busy right now, please try again in a moment.")
+            return render_template("register.html"), 503
 
         db.session.add(user)
         db.session.commit()
@@ -413,15 +890,27 @@ def register():
     return render_template("register.html")
 
 
-@app.route("/login", methods=["GET", "POST"])
+@views.route("/login", methods=["GET", "POST"])
 def login():
     if request.method == "POST":
         username = request.form["username"]
         password = request.form["password"]
 
+        # Throttle bursts per address and per account before any hashing
+        if not (login_ip_throttle.allow(request.remote_addr)
+                and login_username_throttle.allow(username.lower())):
+            flash("Too many login attempts. Please wait a minute and try again.")
+            return render_template("login.html"), 429
+
         user = User.query.filter_by(username=username).first()
 
-        if user and user.check_password(password):
+        try:
+            valid = user and password_hasher.verify(user.password_hash, password)
+        except HashingBusy:
+            flash("We're busy right now, please try again in a moment.")
+            return render_template("login.html"), 503
+
+        if valid:
             login_user(user)
             return redirect(url_for("index"))
         else:
@@ -430,7 +919,7 @@ def login():
     return render_template("login.html")
 
 
-@app.route("/logout")
+@views.route("/logout")
 @login_required
 def logout():
     logout_user()
@@ -439,24 +928,140 @@ def logout():
 
 
 # ---------- Admin ----------
-@app.route("/admin")
+@views.route("/admin")
 @admin_required
 def admin_dashboard():
     # if not current_user.is_admin:
         # flash("Access denied")
         # return redirect(url_for("index"))
 
-    orders = Order.query.order_by(Order.id.desc()).all()
-    total_revenue = sum(order.total for order in orders)
+    per_page = 50
+    before = request.args.get("before", type=int)
+    after = request.args.get("after", type=int)
+
+    # Optional filters, served by the status / order_date indexes
+    status = request.args.get("status") or None
+    date_from = request.args.get("date_from", type=date.fromisoformat)
+    date_to = request.args.get("date_to", type=date.fromisoformat)
+    filters = {
+        "status": status,
+        "date_from": date_from and date_from.isoformat(),
+        "date_to": date_to and date_to.isoformat(),
+    }
+    filters = {key: value for key, value in filters.items() if value}
+
+    # Keyset pagination on the primary key: newest orders first
+    query = Order.query.options(joinedload(Order.user).load_only(User.username))
+    if status:
+        query = query.filter(Order.status == status)
+    if date_from:
+        query = query.filter(Order.order_date >= date_from)
+    if date_to:
+        query = query.filter(Order.order_date <= date_to)
+    if after:
+        query = query.filter(Order.id > after).order_by(Order.id.asc())
+    else:
+        if before:
+            query = query.filter(Order.id < before)
+        query = query.order_by(Order.id.desc())
+
+    orders = query.limit(per_page + 1).all()
+    has_more = len(orders) > per_page
+    orders = orders[:per_page]
+
+    # Cursors for the "Newer" / "Older" links
+    newer = older = None
+    if after:
+        orders.reverse()
+        if orders:
+            newer = orders[0].id if has_more else None
+            older = orders[-1].id
+    elif orders:
+        newer = orders[0].id if before else None
+        older = orders[-1].id if has_more else None
+
+    # Totals come from the rollups (models/rollups.py), not the orders
+    totals = StatusTotals.query.all()
+    total_revenue = sum(row.revenue_cents for row in totals)
+    status_counts = {row.status: row.orders for row in totals}
 
     return render_template(
         "admin.html",
         orders=orders,
-        total_revenue=round(total_revenue, 2)
+        total_revenue=total_revenue,
+        status_counts=status_counts,
+        catalog_version=catalog.version,
+        user_cache=user_cache,
+        newer=newer,
+        older=older,
+        filters=filters
     )
 
 
-@app.route("/register-admin", methods=["GET", "POST"])
+@views.route("/admin/analytics")
+@admin_required
+@read_only_view
+def analytics():
+    days = request.args.get("days", 30, type=int)
+    since = date.today() - timedelta(days=days - 1)
+
+    # Reads only the rollup tables, however many orders there are
+    daily = (
+        DailyRevenue.query
+        .filter(DailyRevenue.day >= since, DailyRevenue.orders > 0)
+        .order_by(DailyRevenue.day.desc())
+        .all()
+    )
+    top_products = (
+        ProductSales.query
+        .filter(ProductSales.units > 0)
+        .order_by(ProductSales.units.desc(), ProductSales.product_name)
+        .limit(20)
+        .all()
+    )
+    statuses = StatusTotals.query.filter(StatusTotals.orders > 0).all()
+
+    return render_template(
+        "analytics.html",
+        days=days,
+        daily=daily,
+        period_revenue=sum(row.revenue_cents for row in daily),
+        period_orders=sum(row.orders for row in daily),
+        total_revenue=sum(row.revenue_cents for row in statuses),
+        top_products=top_products,
+        statuses=statuses
+    )
+
+
+@views.cli.command("rebuild-rollups")
+def rebuild_rollups():
+    """Recompute the analytics rollups from the existing orders."""
+    db.create_all()  # creates the rollup tables on older databases
+    rebuild()
+    db.session.commit()
+    click.echo(f"Rollups rebuilt from {Order.query.count()} orders")
+
+
+@views.cli.command("rebuild-recommendations")
+def rebuild_recommendations():
+    """Recompute the co-purchase counts behind "Frequently bought together"."""
+    db.create_all()  # creates the co_purchases table on older databases
+    rebuild_co_purchases()
+    db.session.commit()
+    click.echo(f"{CoPurchase.query.count()} co-purchase pairs from {Order.query.count()} orders")
+
+
+@views.route("/admin/metrics")
+def metrics_endpoint():
+    # Admins, or a scraper presenting METRICS_TOKEN as a bearer token
+    token = current_app.config["METRICS_TOKEN"]
+    scraper = token and request.headers.get("Authorization") == f"Bearer {token}"
+    if not scraper and not (current_user.is_authenticated and current_user.is_admin):
+        abort(403)
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+@views.route("/register-admin", methods=["GET", "POST"])
 @admin_required
 def register_admin():
     # Only allow current admin users
@@ -475,37 +1080,60 @@ def register_admin():
 
         # Create new admin user
         new_admin = User(username=username)
-        new_admin.set_password(password)
+        try:
+            new_admin.password_hash = password_hasher.hash(password)
+        except HashingBusy:
+            flash("We're busy right now, please try again in a moment.")
+            return render_template("register_admin.html"), 503
         new_admin.is_admin = True
 
         db.session.add(new_admin)
         db.session.commit()
+        user_cache.invalidate(new_admin.id)
 
         flash(f"Admin user '{username}' created successfully!")
-        #return redirect(url_for("admin"))
-        return render_template("admin.html")
+        return redirect(url_for("admin_dashboard"))
 
     return render_template("register_admin.html")
 
 
-@app.route("/admin/update_status/<int:order_id>", methods=["POST"])
+@views.route("/admin/reload_catalog", methods=["POST"])
+@admin_required
+def reload_catalog():
+    try:
+        snapshot = catalog.reload()
+    except (OSError, ValueError, KeyError) as e:
+        flash(f"Catalog reload failed: {e}")
+    else:
+        flash(f"Catalog version {snapshot.version} loaded ({len(snapshot.products)} products)")
+    return redirect(url_for("admin_dashboard"))
+
+
+@views.route("/admin/update_status/<int:order_id>", methods=["POST"])
 @admin_required
 def update_order_status(order_id):
     # if not current_user.is_admin:
         # flash("Access denied")
         # return redirect(url_for("index"))
 
-    order = Order.query.get_or_404(order_id)
     new_status = request.form.get("status")
+    if new_status not in ORDER_STATUSES:
+        abort(400)
+    order = Order.query.get_or_404(order_id)
+    if order.status in UNSETTLED:
+        abort(409)  # settle_payment() decides what becomes of it
 
+    move_status([order.id], new_status)
     order.status = new_status
     db.session.commit()
+    invoice_cache.invalidate(order.id)
+    tracking_cache.update_status(order.id, new_status)
 
     flash(f"Order #{order.id} updated to {new_status}")
     return redirect(url_for("admin_dashboard"))
 
 
-@app.route("/admin/delete_order/<int:order_id>", methods=["POST"])
+@views.route("/admin/delete_order/<int:order_id>", methods=["POST"])
 @admin_required
 def delete_order(order_id):
     # if not current_user.is_admin:
@@ -513,21 +1141,304 @@ def delete_order(order_id):
         # return redirect(url_for("index"))
 
     order = Order.query.get_or_404(order_id)
+    if order.status in UNSETTLED:
+        abort(409)  # deleted by settle_payment() if its payment fails
+    remove_orders([order.id])
+    remove_baskets([order.id])
     db.session.delete(order)
     db.session.commit()
+    invoice_cache.invalidate(order.id)
+    tracking_cache.invalidate(order.id)
 
     flash(f"Order #{order.id} deleted")
     return redirect(url_for("admin_dashboard"))
 
 
-@app.route("/my-orders")
+def refresh_order_caches(order_ids, status=None):
+    # After bulk changes: a new status if given, otherwise the orders are gone
+    for order_id in order_ids:
+        invoice_cache.invalidate(order_id)
+        if status is None:
+            tracking_cache.invalidate(order_id)
+        else:
+            tracking_cache.update_status(order_id, status)
+
+
+@views.route("/admin/orders/bulk_status", methods=["POST"])
+@admin_required
+def bulk_update_order_status():
+    order_ids = request.form.getlist("order_ids", type=int)
+    new_status = request.form.get("status")
+    if not order_ids:
+        flash("No orders selected")
+        return redirect(url_for("admin_dashboard"))
+
+    try:
+        changed = bulk_update_status(order_ids, new_status)
+    except ValueError as e:
+        flash(str(e))
+        return redirect(url_for("admin_dashboard"))
+    db.session.commit()
+    refresh_order_caches(changed, new_status)
+
+    flash(f"{len(changed)} orders updated to {new_status}")
+    return redirect(url_for("admin_dashboard"))
+
+
+@views.route("/admin/orders/bulk_delete", methods=["POST"])
+@admin_required
+def bulk_delete_orders():
+    order_ids = request.form.getlist("order_ids", type=int)
+    if not order_ids:
+        flash("No orders selected")
+        return redirect(url_for("admin_dashboard"))
+
+    order_ids = settled(order_ids)  # pending payments are settle_payment()'s
+    deleted = bulk_delete(order_ids)
+    db.session.commit()
+    refresh_order_caches(order_ids)
+
+    flash(f"{deleted} orders deleted")
+    return redirect(url_for("admin_dashboard"))
+
+
+@views.route("/admin/orders/import", methods=["POST"])
+@admin_required
+def import_order_statuses():
+    upload = request.files.get("file")
+    if not upload or not upload.filename:
+        flash("Choose a CSV file to import")
+        return redirect(url_for("admin_dashboard"))
+
+    # Read straight from the upload stream, one batch at a time
+    lines = TextIOWrapper(upload.stream, encoding="utf-8", newline="")
+    result = import_statuses(
+        lines,
+        current_app.config["IMPORT_BATCH_SIZE"],
+        on_batch=lambda status, order_ids: refresh_order_caches(order_ids, status)
+    )
+
+    message = f"Imported {result.rows} rows, {result.updated} orders updated"
+    if result.rejected:
+        line, reason = result.rejected[0]
+        message += f"; rejected rows starting with line {line}: {reason}"
+    flash(message)
+    return redirect(url_for("admin_dashboard"))
+
+
+@views.route("/admin/orders/export")
+@admin_required
+def export_orders():
+    fmt = request.args.get("format", "csv")
+    if fmt not in ("csv", "ndjson"):
+        abort(400)
+    rows = export_rows(
+        status=request.args.get("status") or None,
+        date_from=request.args.get("date_from", type=date.fromisoformat),
+        date_to=request.args.get("date_to", type=date.fromisoformat),
+        chunk_size=current_app.config["EXPORT_CHUNK_SIZE"]
+    )
+
+    # Rows are fetched, encoded and sent a chunk at a time
+    chunks = to_csv(rows) if fmt == "csv" else to_ndjson(rows)
+    filename = f"orders-{date.today().isoformat()}.{fmt}"
+    mimetype = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    if request.args.get("gzip"):
+        chunks = gzip_chunks(chunks)
+        filename += ".gz"
+        mimetype = "application/gzip"
+
+    response = Response(stream_with_context(chunks), mimetype=mimetype)
+    response.headers["Content-Disposition"] = f"attachment; filename={filename}"
+    return response
+
+
+@views.cli.command("import-statuses")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+def import_statuses_command(path):
+    """Apply a courier status file of `order_id,status` rows."""
+    with open(path, newline="", encoding="utf-8") as f:
+        result = import_statuses(f, current_app.config["IMPORT_BATCH_SIZE"])
+    for line, reason in result.rejected:
+        click.echo(f"line {line}: {reason}", err=True)
+    click.echo(f"Imported {result.rows} rows, {result.updated} orders updated")
+
+
+@views.route("/my-orders")
 @login_required
+@read_only_view
 def my_orders():
-    orders = current_user.orders
+    # current_user is a cached snapshot, so query the orders directly
+    orders = (
+        Order.query
+        .filter_by(user_id=current_user.id)
+        .options(selectinload(Order.items))
+        .order_by(Order.id.desc())
+        .all()
+    )
     return render_template("my_orders.html", orders=orders)
 
 
+# ---------- JSON API (v1) ----------
+# Read-only JSON over the catalog and orders. Lists are cursor-paginated
+# (pass back `next_cursor` as `cursor`), accept `fields=a,b` to pick the
+# fields returned, are streamed row by row and carry an ETag.
+
+def api_error(status, message):
+    return jsonify(error=message), status
+
+
+def api_login_required(func):
+    # Same as login_required, but answers 401 instead of redirecting
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if not current_user.is_authenticated:
+            return api_error(401, "Authentication required")
+        return func(*args, **kwargs)
+    return wrapper
+
+
+def api_limit():
+    limit = request.args.get("limit", current_app.config["API_PAGE_SIZE"], type=int)
+    return min(max(limit, 1), current_app.config["API_MAX_PAGE_SIZE"])
+
+
+def api_etag(*parts):
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def api_page(rows, serialize, next_cursor, etag, private=True):
+    if request.if_none_match.contains(etag):
+        return with_etag(make_response("", 304), etag, private)
+    response = Response(
+        stream_with_context(stream_page(rows, serialize, next_cursor)),
+        mimetype="application/json"
+    )
+    return with_etag(response, etag, private)
+
+
+@views.route("/api/v1/products")
+@read_only_view
+def api_products():
+    snapshot = current_catalog()
+    try:
+        fields = parse_fields(request.args.get("fields"), PRODUCT_FIELDS)
+        cursor = decode_cursor(request.args["cursor"], ("o",)) if request.args.get("cursor") else {}
+    except ValueError as e:
+        return api_error(400, str(e))
+
+    # Positions are only stable within one catalog version
+    if cursor and cursor.get("v") != snapshot.version:
+        return api_error(410, "Catalog changed since this cursor was issued, start again")
+    offset = cursor.get("o", 0)
+    limit = api_limit()
+
+    products, has_more = snapshot.index.search(
+        q=request.args.get("q", "").strip(),
+        kind=request.args.get("type") or None,
+        min_price=request.args.get("min_price", type=float),
+        max_price=request.args.get("max_price", type=float),
+        min_rating=request.args.get("min_rating", type=int),
+        sort=request.args.get("sort", "default"),
+        offset=offset,
+        limit=limit
+    )
+    next_cursor = encode_cursor({"v": snapshot.version, "o": offset + limit}) if has_more else None
+
+    # The catalog is the same for everyone, so shared caches may keep it
+    etag = api_etag("products", snapshot.version, sorted(request.args.items(multi=True)))
+    return api_page(
+        products, lambda product: product_to_dict(product, fields), next_cursor, etag, private=False
+    )
+
+
+@views.route("/api/v1/products/<int:product_id>")
+@read_only_view
+def api_product(product_id):
+    snapshot = current_catalog()
+    product = snapshot.products.get(product_id)
+    if not product:
+        return api_error(404, "Product not found")
+    try:
+        fields = parse_fields(request.args.get("fields"), PRODUCT_FIELDS)
+    except ValueError as e:
+        return api_error(400, str(e))
+
+    etag = api_etag("product", snapshot.version, product_id, fields)
+    if request.if_none_match.contains(etag):
+        return with_etag(make_response("", 304), etag, private=False)
+    return with_etag(jsonify(product_to_dict(product, fields)), etag, private=False)
+
+
+def order_query(fields):
+    # Only load the columns asked for, and the items only if wanted
+    columns = [getattr(Order, name) for name in fields if name != "items"]
+    query = Order.query.options(load_only(Order.id, Order.user_id, Order.status, Order.delivery_date, *columns))
+    if "items" in fields:
+        query = query.options(selectinload(Order.items))
+    return query
+
+
+def order_version(order):
+    # Everything about an order that can change after checkout
+    return (order.id, order.status, order.delivery_date)
+
+
+@views.route("/api/v1/orders")
+@api_login_required
+@read_only_view
+def api_orders():
+    try:
+        fields = parse_fields(request.args.get("fields"), ORDER_FIELDS)
+        item_fields = parse_fields(request.args.get("item_fields"), ITEM_FIELDS)
+        cursor = decode_cursor(request.args["cursor"], ("before",)) if request.args.get("cursor") else {}
+    except ValueError as e:
+        return api_error(400, str(e))
+    limit = api_limit()
+
+    # Keyset pagination, newest first; admins may list every order
+    query = order_query(fields)
+    if not (current_user.is_admin and request.args.get("all")):
+        query = query.filter(Order.user_id == current_user.id)
+    if request.args.get("status"):
+        query = query.filter(Order.status == request.args["status"])
+    if cursor.get("before"):
+        query = query.filter(Order.id < cursor["before"])
+    orders = query.order_by(Order.id.desc()).limit(limit + 1).all()
+
+    has_more = len(orders) > limit
+    orders = orders[:limit]
+    next_cursor = encode_cursor({"before": orders[-1].id}) if has_more else None
+
+    etag = api_etag(
+        "orders", current_user.get_id(), sorted(request.args.items(multi=True)),
+        [order_version(order) for order in orders]
+    )
+    return api_page(orders, lambda order: order_to_dict(order, fields, item_fields), next_cursor, etag)
+
+
+@views.route("/api/v1/orders/<int:order_id>")
+@api_login_required
+@read_only_view
+def api_order(order_id):
+    try:
+        fields = parse_fields(request.args.get("fields"), ORDER_FIELDS)
+        item_fields = parse_fields(request.args.get("item_fields"), ITEM_FIELDS)
+    except ValueError as e:
+        return api_error(400, str(e))
+
+    order = order_query(fields).filter(Order.id == order_id).first()
+    if not order or (order.user_id != current_user.id and not current_user.is_admin):
+        return api_error(404, "Order not found")
+
+    etag = api_etag("order", current_user.get_id(), order_version(order), fields, item_fields)
+    if request.if_none_match.contains(etag):
+        return with_etag(make_response("", 304), etag)
+    return with_etag(jsonify(order_to_dict(order, fields, item_fields)), etag)
+
+
 if __name__ == "__main__":
+	app = create_app()
 	with app.app_context():
 		db.create_all()  # make sure tables exist
 
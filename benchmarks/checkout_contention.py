@@ -0,0 +1,120 @@
+"""Flash-sale benchmark: many buyers checking out the same SKU at once.
+
+Seeds a throw-away database with BUYERS users and STOCK units of one
+product, then has every buyer add it to their cart and check out at the
+same moment. Reports checkout throughput and verifies that exactly
+STOCK orders succeeded and stock never went negative.
+
+With --payment-latency / --payment-failure-rate, payments go through the
+stub gateway so checkout throughput can be measured against a slow or
+flaky payment provider.
+
+Usage: python benchmarks/checkout_contention.py [--buyers 50] [--stock 20]
+           [--payment-latency 0.2] [--payment-failure-rate 0.1]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SKU = 1
+CHECKOUT_FORM = {
+    "payment": "credit/debit card",
+    "address": "1 Bench Street",
+    "city": "Berlin",
+    "zip": "10115",
+    "country": "Germany",
+    "delivery_company": "DHL",
+}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--buyers", type=int, default=50)
+    parser.add_argument("--stock", type=int, default=20)
+    parser.add_argument("--payment-latency", type=float, default=None)
+    parser.add_argument("--payment-failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp(prefix="ministore-bench-")
+    import config
+    config.Config.SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(tmp_dir, 'store.db')}"
+    config.Config.CART_STORE_PATH = os.path.join(tmp_dir, "carts.db")
+    if args.payment_latency is not None or args.payment_failure_rate:
+        config.Config.PAYMENT_STUB = True
+        config.Config.PAYMENT_STUB_LATENCY = args.payment_latency or 0.0
+        config.Config.PAYMENT_STUB_FAILURE_RATE = args.payment_failure_rate
+
+    from app import create_app
+    from models.user import db, User
+    from models.order import Order
+    from models.inventory import Inventory, set_stock
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        for n in range(args.buyers):
+            user = User(username=f"buyer{n}")
+            user.set_password("bench")
+            db.session.add(user)
+        set_stock(SKU, args.stock)
+        db.session.commit()
+
+    # Log every buyer in and fill their cart before the sale opens
+    clients = []
+    for n in range(args.buyers):
+        client = app.test_client()
+        client.environ_base["REMOTE_ADDR"] = f"10.0.{n // 256}.{n % 256}"
+        client.post("/login", data={"username": f"buyer{n}", "password": "bench"})
+        client.post(f"/add/{SKU}", data={"quantity": 1})
+        clients.append(client)
+
+    start = threading.Barrier(args.buyers + 1)
+    results = [None] * args.buyers
+    latencies = [0.0] * args.buyers
+
+    def buy(n):
+        start.wait()
+        t0 = time.perf_counter()
+        response = clients[n].post("/cart", data=CHECKOUT_FORM)
+        latencies[n] = time.perf_counter() - t0
+        results[n] = "/success/" in response.headers.get("Location", "")
+
+    threads = [threading.Thread(target=buy, args=(n,)) for n in range(args.buyers)]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    t0 = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - t0
+
+    with app.app_context():
+        orders = Order.query.count()
+        left = db.session.get(Inventory, SKU).quantity
+
+    succeeded = sum(results)
+    latencies.sort()
+    print(f"buyers:            {args.buyers}")
+    print(f"initial stock:     {args.stock}")
+    print(f"orders placed:     {succeeded} ({orders} in database)")
+    print(f"stock left:        {left}")
+    print(f"wall time:         {elapsed * 1000:.1f} ms")
+    print(f"throughput:        {args.buyers / elapsed:.1f} checkouts/s")
+    print(f"p50 / max latency: {latencies[len(latencies) // 2] * 1000:.1f} / {latencies[-1] * 1000:.1f} ms")
+
+    # Declined payments give their stock back, so only successes count
+    expected = min(args.buyers, args.stock)
+    lost = orders != succeeded or left != args.stock - succeeded
+    if lost or succeeded > expected or (not args.payment_failure_rate and succeeded != expected):
+        print("FAIL: stock was oversold or reservations were lost")
+        sys.exit(1)
+    print("OK: no overselling")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+"""End-to-end load benchmark: a synthetic store driven by many clients.
+
+Seeds a throw-away database (or reuses --db) with USERS customers,
+PRODUCTS catalog entries and ORDERS past orders, then runs CLIENTS
+concurrent shoppers against the app in-process for DURATION seconds.
+Each shopper mixes the store's main flows: browsing index pages and
+searches, product pages, adding to the cart, checking out, downloading
+invoices, tracking orders and (as an admin) paging the dashboard.
+
+Prints requests, throughput and p50/p95/p99 latency per route, then
+compares them with the baseline (benchmarks/baseline.json by default,
+recorded with --save-baseline together with the run parameters). The
+run fails when any route's p95 latency or throughput is more than
+--tolerance worse, when the baseline is missing, or when it was
+recorded with other parameters; --no-baseline skips the comparison.
+Everything runs offline; payments use the stub gateway.
+
+Usage: python benchmarks/load_suite.py [--users 2000] [--products 2000]
+           [--orders 200000] [--clients 16] [--duration 20] [--db PATH]
+           [--baseline benchmarks/baseline.json] [--save-baseline | --no-baseline]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PASSWORD = "bench"
+IMAGES = ["mouse.png", "keyboard.jpg", "laptop.png", "book.jpg", "ebook.jpg", "desk_lamp.jpg", "usbc_hub.jpg"]
+WORDS = ["wireless", "mechanical", "compact", "pro", "ultra", "smart", "classic", "travel",
+         "mouse", "keyboard", "lamp", "hub", "stand", "course", "ebook", "subscription", "drive"]
+STATUSES = ["Confirmed", "Shipped", "Out for Delivery", "Delivered"]
+CHECKOUT_FORM = {
+    "payment": "credit/debit card",
+    "address": "1 Bench Street",
+    "city": "Berlin",
+    "zip": "10115",
+    "country": "Germany",
+    "delivery_company": "DHL",
+}
+
+# Relative weight of each shopper action
+FLOWS = {
+    "index": 25,
+    "search": 10,
+    "product_detail": 25,
+    "add_to_cart": 15,
+    "checkout_cart": 5,
+    "generate_invoice": 5,
+    "track": 10,
+    "admin_dashboard": 5,
+}
+
+
+def write_catalog(path, count, rng):
+    types = ["physical", "digital", "subscription"]
+    products = [
+        {
+            "id": n,
+            "name": " ".join(rng.sample(WORDS, 3)).title(),
+            "price": round(rng.uniform(2, 500), 2),
+            "type": types[n % 3],
+            "image": IMAGES[n % len(IMAGES)],
+            "rating": rng.randint(0, 5),
+        }
+        for n in range(1, count + 1)
+    ]
+    with open(path, "w") as f:
+        json.dump(products, f)
+    return products
+
+
+def seed(app, args, products, rng):
+    from sqlalchemy import insert
+    from werkzeug.security import generate_password_hash
+    from models.user import db, User
+    from models.order import Order, OrderItem
+    from models.inventory import Inventory
+    from models.pricing import to_cents, totals_for
+    from models.rollups import rebuild
+    from models.recommendations import rebuild_co_purchases
+
+    # One hash shared by every account: hashing thousands is slow
+    password_hash = generate_password_hash(PASSWORD)
+    today = date.today()
+
+    with app.app_context():
+        db.create_all()
+        db.session.execute(insert(User), [
+            {"username": f"user{n}", "password_hash": password_hash, "is_admin": False}
+            for n in range(1, args.users + 1)
+        ] + [
+            {"username": f"admin{n}", "password_hash": password_hash, "is_admin": True}
+            for n in range(args.clients)
+        ])
+        db.session.execute(insert(Inventory), [
+            {"product_id": product["id"], "quantity": 10 ** 9} for product in products
+        ])
+
+        # Order n belongs to user ((n - 1) % users) + 1
+        batch = 5000
+        for start in range(1, args.orders + 1, batch):
+            orders = []
+            items = []
+            for order_id in range(start, min(start + batch, args.orders + 1)):
+                lines = rng.sample(products, rng.randint(1, 3))
+                quantities = [rng.randint(1, 3) for _ in lines]
+                subtotal = sum(to_cents(p["price"]) * q for p, q in zip(lines, quantities))
+                totals = totals_for(subtotal)
+                order_date = today - timedelta(days=rng.randint(0, 365))
+                orders.append({
+                    "id": order_id,
+                    "user_id": (order_id - 1) % args.users + 1,
+                    "address": "1 Seed Street", "city": "Berlin", "zip_code": "10115",
+                    "country": "Germany", "delivery_company": "DHL",
+                    "order_date": order_date, "delivery_date": order_date + timedelta(days=3),
+                    "payment_method": "Paypal", "total": subtotal / 100,
+                    "subtotal_cents": totals.subtotal, "vat_cents": totals.vat, "total_cents": totals.total,
+                    "status": rng.choice(STATUSES),
+                })
+                items.extend(
+                    {"order_id": order_id, "product_id": p["id"], "product_name": p["name"],
+                     "price": p["price"], "quantity": q, "product_image": p["image"]}
+                    for p, q in zip(lines, quantities)
+                )
+            db.session.execute(insert(Order), orders)
+            db.session.execute(insert(OrderItem), items)
+        rebuild()
+        rebuild_co_purchases()
+        db.session.commit()
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Shopper:
+    def __init__(self, app, n, args, product_ids, rng):
+        self.rng = rng
+        self.args = args
+        self.product_ids = product_ids
+        self.user_id = n % args.users + 1
+        # A few of this user's seeded orders, for invoices (see seed())
+        self.orders = list(range(self.user_id, args.orders + 1, args.users))[:3]
+
+        self.client = app.test_client()
+        self.client.environ_base["REMOTE_ADDR"] = f"10.1.{n // 256}.{n % 256}"
+        self.client.post("/login", data={"username": f"user{self.user_id}", "password": PASSWORD})
+        self.admin = app.test_client()
+        self.admin.environ_base["REMOTE_ADDR"] = f"10.2.{n // 256}.{n % 256}"
+        self.admin.post("/login", data={"username": f"admin{n}", "password": PASSWORD})
+
+    def run(self, action):
+        """Do one action; return (route, ok)."""
+        rng = self.rng
+        if action == "index":
+            page = rng.randint(1, 20)
+            response = self.client.get(f"/page/{page}" if page > 1 else "/")
+        elif action == "search":
+            response = self.client.get("/", query_string={
+                "q": rng.choice(WORDS), "sort": rng.choice(["default", "price_asc", "rating"]),
+            })
+            action = "index"
+        elif action == "product_detail":
+            response = self.client.get(f"/product/{rng.choice(self.product_ids)}")
+        elif action == "add_to_cart":
+            response = self.client.post(f"/add/{rng.choice(self.product_ids)}", data={"quantity": 1})
+        elif action == "checkout_cart":
+            self.client.post(f"/add/{rng.choice(self.product_ids)}", data={"quantity": 1})
+            response = self.client.post("/cart", data=CHECKOUT_FORM)
+            location = response.headers.get("Location", "")
+            if "/success/" in location:
+                self.orders.append(int(location.rstrip("/").rsplit("/", 1)[1]))
+        elif action == "generate_invoice":
+            if not self.orders:
+                return None, True
+            response = self.client.get(f"/invoice/{rng.choice(self.orders)}")
+        elif action == "track":
+            response = self.client.post("/track", data={"order_id": rng.randint(1, max(self.args.orders, 1))})
+        else:
+            params = {}
+            if rng.random() < 0.3:
+                params["status"] = rng.choice(STATUSES)
+            if rng.random() < 0.3 and self.args.orders:
+                params["before"] = rng.randint(1, self.args.orders)
+            response = self.admin.get("/admin", query_string=params)
+        return action, response.status_code < 400
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--orders", type=int, default=200000)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--db", help="database file to use; seeded only if it does not exist")
+    parser.add_argument("--baseline", default=os.path.join(BENCH_DIR, "baseline.json"))
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--save-baseline", action="store_true")
+    mode.add_argument("--no-baseline", action="store_true", help="only print the results")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+    # What the numbers depend on; a baseline only compares to the same run
+    params = {name: getattr(args, name) for name in ("users", "products", "orders", "clients", "duration", "seed")}
+    rng = random.Random(args.seed)
+
+    db_path = os.path.abspath(args.db) if args.db else os.path.join(tempfile.mkdtemp(prefix="ministore-load-"), "store.db")
+    data_dir = os.path.dirname(db_path)
+    os.makedirs(data_dir, exist_ok=True)
+    catalog_path = os.path.join(data_dir, "bench-products.json")
+    needs_seed = not os.path.exists(db_path)
+
+    import config
+    config.Config.SQLALCHEMY_DATABASE_URI = f"sqlite:///{db_path}"
+    config.Config.CATALOG_PATH = catalog_path
+    config.Config.CART_STORE_PATH = os.path.join(data_dir, "carts.db")
+    config.Config.PAYMENT_STUB = True
+    config.Config.PAYMENT_STUB_LATENCY = 0.0
+
+    if needs_seed or not os.path.exists(catalog_path):
+        products = write_catalog(catalog_path, args.products, random.Random(args.seed))
+    else:
+        with open(catalog_path) as f:
+            products = json.load(f)
+
+    from app import create_app, warm_up, image_pipeline
+    app = create_app()
+
+    if needs_seed:
+        t0 = time.perf_counter()
+        seed(app, args, products, rng)
+        print(f"seeded {args.users} users, {len(products)} products, {args.orders} orders "
+              f"in {time.perf_counter() - t0:.1f}s ({db_path})")
+
+    # Warm up as a deployment would: prebuilt images, preloaded subsystems
+    with app.app_context():
+        image_pipeline.build_all(product["image"] for product in products)
+    warm_up(app)
+
+    product_ids = [product["id"] for product in products]
+    shoppers = [Shopper(app, n, args, product_ids, random.Random(args.seed + n)) for n in range(args.clients)]
+    actions = list(FLOWS)
+    weights = [FLOWS[action] for action in actions]
+
+    latencies = {}
+    errors = {}
+    lock = threading.Lock()
+    start = threading.Barrier(args.clients + 1)
+
+    def shop(shopper):
+        local = {}
+        local_errors = {}
+        start.wait()
+        deadline = time.perf_counter() + args.duration
+        while time.perf_counter() < deadline:
+            action = shopper.rng.choices(actions, weights)[0]
+            t0 = time.perf_counter()
+            route, ok = shopper.run(action)
+            if route is None:
+                continue
+            local.setdefault(route, []).append(time.perf_counter() - t0)
+            if not ok:
+                local_errors[route] = local_errors.get(route, 0) + 1
+        with lock:
+            for route, values in local.items():
+                latencies.setdefault(route, []).extend(values)
+            for route, count in local_errors.items():
+                errors[route] = errors.get(route, 0) + count
+
+    threads = [threading.Thread(target=shop, args=(shopper,)) for shopper in shoppers]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    t0 = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - t0
+
+    results = {}
+    print(f"\n{args.clients} clients for {elapsed:.1f}s\n")
+    print(f"{'route':<18} {'requests':>9} {'errors':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for route in sorted(latencies):
+        values = sorted(latencies[route])
+        results[route] = {
+            "requests": len(values),
+            "errors": errors.get(route, 0),
+            "throughput": len(values) / elapsed,
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+        }
+        r = results[route]
+        print(f"{route:<18} {r['requests']:>9} {r['errors']:>7} {r['throughput']:>8.1f} "
+              f"{r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f}")
+    total = sum(r["requests"] for r in results.values())
+    print(f"{'total':<18} {total:>9} {sum(errors.values()):>7} {total / elapsed:>8.1f}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({"params": params, "routes": results}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"\nbaseline saved to {args.baseline}")
+        return
+
+    failures = [f"{route}: {count} failed requests" for route, count in errors.items() if count]
+    if args.no_baseline:
+        print("\nnot compared with a baseline (--no-baseline)")
+    elif not os.path.exists(args.baseline):
+        failures.append(f"no baseline at {args.baseline}; record one with --save-baseline or pass --no-baseline")
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("params") != params:
+            failures.append(f"baseline was recorded with {baseline.get('params')}, this run used {params}; "
+                            f"run with the same options or record a new baseline")
+        else:
+            for route, base in baseline["routes"].items():
+                current = results.get(route)
+                if current is None:
+                    continue
+                if current["p95_ms"] > base["p95_ms"] * (1 + args.tolerance):
+                    failures.append(f"{route}: p95 {current['p95_ms']:.1f} ms vs baseline {base['p95_ms']:.1f} ms")
+                if current["throughput"] < base["throughput"] * (1 - args.tolerance):
+                    failures.append(f"{route}: {current['throughput']:.1f} req/s vs baseline {base['throughput']:.1f} req/s")
+
+    if failures:
+        print("\nFAIL:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("\nOK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Startup benchmark: how long a new worker takes to import, boot and
+serve its first request.
+
+Each run is a fresh interpreter, as on a worker (re)start. It times
+`import app`, `create_app()` and then the first request, served by a
+forked child the way a prefork server does it. Runs are repeated with
+PRELOAD off (subsystems built on first use, in the worker) and on
+(built by create_app() in the parent, before the fork), and for
+database/init_db.py's imports. Prints the median of --runs runs.
+
+Usage: python benchmarks/startup.py [--runs 7] [--path /product/1]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Run in a child interpreter; prints its timings (ms) as JSON
+CHILD = """
+import json, os, sys, time
+t0 = time.perf_counter()
+if sys.argv[1] == "init_db":
+    from flask import Flask
+    from models.user import db
+    from models import inventory, jobs, order, recommendations, rollups
+    print(json.dumps({"import": (time.perf_counter() - t0) * 1000}))
+    sys.exit()
+
+import app as store
+t1 = time.perf_counter()
+application = store.create_app()
+t2 = time.perf_counter()
+if sys.argv[1] == "setup":
+    with application.app_context():
+        store.db.create_all()
+    sys.exit()
+
+read, write = os.pipe()
+if os.fork() == 0:
+    t3 = time.perf_counter()
+    status = application.test_client().get(sys.argv[2]).status_code
+    os.write(write, json.dumps([status, (time.perf_counter() - t3) * 1000]).encode())
+    os._exit(0)
+os.wait()
+status, first = json.loads(os.read(read, 4096))
+assert status == 200, status
+print(json.dumps({"import": (t1 - t0) * 1000, "create_app": (t2 - t1) * 1000, "first request": first}))
+"""
+
+
+def run(mode, path, env):
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD, mode, path], cwd=ROOT, env=env,
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(out.splitlines()[-1]) if out else {}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--path", default="/product/1")
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp(prefix="ministore-startup-")
+    env = dict(
+        os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmp_dir, 'store.db')}",
+        CART_STORE_PATH=os.path.join(tmp_dir, "carts.db"), PRELOAD="0"
+    )
+    run("setup", args.path, env)
+
+    cases = [
+        ("app, lazy", "app", env),
+        ("app, PRELOAD=1", "app", dict(env, PRELOAD="1")),
+        ("init_db imports", "init_db", env),
+    ]
+    print(f"median of {args.runs} runs, ms; first request: GET {args.path} in a forked worker")
+    print(f"{'':18} {'import':>8} {'create_app':>11} {'first request':>14} {'total':>8}")
+    for label, mode, case_env in cases:
+        runs = [run(mode, args.path, case_env) for _ in range(args.runs)]
+        medians = {key: statistics.median(r[key] for r in runs) for key in runs[0]}
+        cells = [medians.get(key) for key in ("import", "create_app", "first request")]
+        total = sum(cell for cell in cells if cell is not None)
+        row = " ".join(f"{cell:{width}.1f}" if cell is not None else f"{'-':>{width}}"
+                       for cell, width in zip(cells, (8, 11, 14)))
+        print(f"{label:18} {row} {total:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
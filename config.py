@@ -1,4 +1,102 @@
+import os
+
+
+def _env_int(name):
+    value = os.environ.get(name)
+    return int(value) if value else None
+
+
 class Config:
     SECRET_KEY = "secret123"
-    SQLALCHEMY_DATABASE_URI = "sqlite:///store.db"
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Database, from the environment (see models/db_profile.py)
+    SQLALCHEMY_DATABASE_URI = os.environ.get("DATABASE_URL", "sqlite:///store.db")
+    # Optional replica, or e.g. "sqlite:///file:store.db?mode=ro&uri=true"
+    # for a separate read-only connection pool; used by read-only views
+    READ_DATABASE_URI = os.environ.get("READ_DATABASE_URL")
+    DB_PROFILE = os.environ.get("DB_PROFILE", "default")  # default / durable / high-concurrency
+    DB_OVERRIDES = {
+        "pool_size": _env_int("DB_POOL_SIZE"),
+        "max_overflow": _env_int("DB_MAX_OVERFLOW"),
+        "pool_timeout": _env_int("DB_POOL_TIMEOUT"),
+        "pool_recycle": _env_int("DB_POOL_RECYCLE"),
+        "sqlite_journal_mode": os.environ.get("SQLITE_JOURNAL_MODE"),
+        "sqlite_busy_timeout": _env_int("SQLITE_BUSY_TIMEOUT"),
+        "sqlite_synchronous": os.environ.get("SQLITE_SYNCHRONOUS"),
+    }
+
+    # Build the catalog, payment gateways, invoice renderer etc. when the
+    # app is created instead of on first use (see warm_up() in app.py)
+    PRELOAD = os.environ.get("PRELOAD") == "1"
+
+    # Per-user carts: "sqlite" (shared by workers) or "memory" (single process only)
+    CART_STORE = "sqlite"
+    CART_STORE_PATH = os.environ.get("CART_STORE_PATH", "carts.db")  # relative to instance/
+    CART_TTL = 7 * 24 * 3600  # seconds a cart survives without changes
+    CART_MAX_ENTRIES = 10000  # memory store only
+
+    # Logged-in user snapshots kept per worker (see models/user_cache.py)
+    USER_CACHE_SIZE = 10000
+    USER_CACHE_TTL = 60  # seconds
+
+    # Password hashing pool (0 workers = hash inline) and login throttling
+    PASSWORD_HASH_WORKERS = 2
+    PASSWORD_HASH_QUEUE = 32  # hashes allowed to wait before we answer 503
+    PASSWORD_HASH_TIMEOUT = 10
+    LOGIN_RATE_PER_IP = (1.0, 20)  # (tokens per second, burst)
+    LOGIN_RATE_PER_USERNAME = (0.1, 5)
+
+    INVOICE_CACHE_BYTES = 32 * 1024 * 1024  # rendered PDFs kept in memory
+    FRAGMENT_CACHE_SIZE = 1024  # rendered product grid / detail fragments
+
+    # Public order tracking (see models/tracking.py)
+    TRACKING_CACHE_SIZE = 50000
+    TRACKING_CACHE_TTL = 30  # seconds other workers may show an old status
+    TRACKING_BATCH_MAX = 500  # order ids per /track/batch request
+
+    # Request metrics (see models/metrics.py)
+    METRICS_N_PLUS_ONE_THRESHOLD = 10  # same statement this often in one request
+    METRICS_TOKEN = os.environ.get("METRICS_TOKEN")  # lets a scraper in without a session
+
+    # Background jobs after checkout (see models/jobs.py); with 0 workers
+    # run them in a separate process with `flask run-jobs`
+    JOB_WORKERS = 2
+    JOB_POLL_INTERVAL = 1.0  # seconds an idle worker sleeps between checks
+    JOB_LEASE = 300  # seconds before a job whose worker died runs again
+    JOB_MAX_ATTEMPTS = 5  # then the job is kept as "dead" for requeue-dead-jobs
+    JOB_RETRY_BACKOFF = 5  # seconds before the first retry, doubled each time
+    JOB_RETRY_MAX_BACKOFF = 3600
+    JOB_RETENTION = 24 * 3600  # seconds finished jobs are kept
+
+    # "Frequently bought together" (see models/recommendations.py)
+    RECOMMENDATIONS_SHOWN = 4
+    RECOMMENDATIONS_TOP_K = 8  # kept per product, as some may leave the catalog
+    RECOMMENDATIONS_CACHE_SIZE = 10000
+    RECOMMENDATIONS_TTL = 300  # seconds other workers may show an older ranking
+
+    IMPORT_BATCH_SIZE = 1000  # courier status rows applied per transaction
+    EXPORT_CHUNK_SIZE = 1000  # rows fetched per round trip by order exports
+
+    # JSON API (/api/v1): default and largest page sizes
+    API_PAGE_SIZE = 50
+    API_MAX_PAGE_SIZE = 200
+
+    # Resized product images (see models/images.py)
+    IMAGE_DERIVATIVES_DIR = "static/images/derived"
+    IMAGE_MAX_AGE = 365 * 24 * 3600
+
+    CATALOG_PATH = "products.json"  # or a file from `flask build-catalog` (.bin)
+    CATALOG_CHECK_INTERVAL = 2  # seconds between products.json mtime checks
+
+    # Payment gateways (see models/payment.py)
+    PAYMENT_TIMEOUT = 10  # seconds, default for every gateway
+    PAYMENT_TIMEOUTS = {"bank transfer": 30}
+    PAYMENT_WORKERS = 8
+    PAYMENT_QUEUE = 64  # calls allowed to wait for a worker
+    # Seconds after checkout before a job settles an order whose payment
+    # outcome was never recorded (e.g. the worker died mid-payment)
+    PAYMENT_RECONCILE_AFTER = 120
+    PAYMENT_STUB = False  # simulate a remote gateway
+    PAYMENT_STUB_LATENCY = 0.2
+    PAYMENT_STUB_FAILURE_RATE = 0.0
@@ -1,10 +1,19 @@
 import sys
 import os
 
-sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
 
-from app import app
+from flask import Flask
+from config import Config
+from models.db_profile import init_database
 from models.user import db, User
+# Only the table definitions: no views, catalog or invoice renderer
+from models import inventory, jobs, order, recommendations, rollups  # noqa: F401
+
+app = Flask(__name__, root_path=ROOT, instance_path=os.path.join(ROOT, "instance"))
+app.config.from_object(Config)
+init_database(app, db)
 
 with app.app_context():
     db.create_all()
@@ -0,0 +1,39 @@
+"""Create the background job table (see models/jobs.py), in place.
+
+Checkout enqueues its post-order work there in the same transaction
+that records the payment and confirms the order. Safe to run more than
+once.
+
+Usage: python database/migrate_jobs.py [path/to/store.db]
+"""
+import os
+import sqlite3
+import sys
+
+DEFAULT_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "instance", "store.db")
+
+
+def migrate(path):
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "  id INTEGER NOT NULL PRIMARY KEY,"
+            "  kind VARCHAR(50) NOT NULL,"
+            "  payload TEXT NOT NULL,"
+            "  status VARCHAR(10) NOT NULL,"
+            "  attempts INTEGER NOT NULL,"
+            "  max_attempts INTEGER NOT NULL,"
+            "  run_at FLOAT NOT NULL,"
+            "  locked_until FLOAT,"
+            "  last_error TEXT,"
+            "  created_at FLOAT NOT NULL"
+            ")"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_jobs_status_run_at ON jobs (status, run_at)")
+    conn.close()
+    print("jobs table ready")
+
+
+if __name__ == "__main__":
+    migrate(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_DB)
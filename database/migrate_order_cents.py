@@ -0,0 +1,44 @@
+"""Add the integer-cents totals to orders and backfill them, in place.
+
+Orders now store subtotal_cents / vat_cents / total_cents, fixed at
+checkout (see models/pricing.py). Existing orders get them computed from
+their items with the same rounding: each unit price to whole cents,
+VAT at 10% rounded half up. Safe to run more than once.
+
+Usage: python database/migrate_order_cents.py [path/to/store.db]
+"""
+import os
+import sqlite3
+import sys
+
+DEFAULT_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "instance", "store.db")
+
+VAT_BASIS_POINTS = 1000  # as in models/pricing.py
+
+
+def migrate(path):
+    conn = sqlite3.connect(path)
+    with conn:
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(orders)")]
+        for column in ("subtotal_cents", "vat_cents", "total_cents"):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE orders ADD COLUMN {column} INTEGER")
+                print(f"orders.{column} added")
+
+        cursor = conn.execute(
+            "UPDATE orders SET subtotal_cents = ("
+            "  SELECT COALESCE(SUM(CAST(ROUND(price * 100) AS INTEGER) * quantity), 0)"
+            "  FROM order_items WHERE order_items.order_id = orders.id"
+            ") WHERE subtotal_cents IS NULL"
+        )
+        print(f"subtotal_cents: backfilled {cursor.rowcount} orders")
+        conn.execute(
+            "UPDATE orders SET vat_cents = (subtotal_cents * ? + 5000) / 10000 WHERE vat_cents IS NULL",
+            (VAT_BASIS_POINTS,),
+        )
+        conn.execute("UPDATE orders SET total_cents = subtotal_cents + vat_cents WHERE total_cents IS NULL")
+    conn.close()
+
+
+if __name__ == "__main__":
+    migrate(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_DB)
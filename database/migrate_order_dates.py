@@ -0,0 +1,48 @@
+"""Convert order dates to ISO dates and add the order indexes, in place.
+
+Older databases store orders.order_date / delivery_date as "%d-%m-%Y"
+strings. SQLAlchemy's Date type on SQLite reads and writes "YYYY-MM-DD",
+which also sorts and range-compares correctly, so the values are
+rewritten in that form. Safe to run more than once.
+
+Usage: python database/migrate_order_dates.py [path/to/store.db]
+"""
+import os
+import sqlite3
+import sys
+
+DEFAULT_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "instance", "store.db")
+
+# Same names SQLAlchemy gives the index=True columns in models/order.py
+INDEXES = {
+    "ix_orders_user_id": ("orders", "user_id"),
+    "ix_orders_status": ("orders", "status"),
+    "ix_orders_order_date": ("orders", "order_date"),
+    "ix_order_items_order_id": ("order_items", "order_id"),
+}
+
+DMY = "[0-9][0-9]-[0-9][0-9]-[0-9][0-9][0-9][0-9]"
+
+
+def migrate(path):
+    conn = sqlite3.connect(path)
+    with conn:
+        for column in ("order_date", "delivery_date"):
+            cursor = conn.execute(
+                f"UPDATE orders SET {column} = "
+                f"substr({column}, 7, 4) || '-' || substr({column}, 4, 2) || '-' || substr({column}, 1, 2) "
+                f"WHERE {column} GLOB ?",
+                (DMY,),
+            )
+            print(f"{column}: converted {cursor.rowcount} rows")
+
+        for name, (table, column) in INDEXES.items():
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({column})")
+            print(f"index {name} ready")
+
+    conn.execute("ANALYZE")
+    conn.close()
+
+
+if __name__ == "__main__":
+    migrate(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_DB)
@@ -0,0 +1,62 @@
+"""Record the catalog product id on order items, in place.
+
+Order items used to store only the product name. This adds
+order_items.product_id and fills it in by matching names against the
+catalog; items whose name matches no product, or more than one, keep
+NULL. It also creates the co_purchases table behind "Frequently bought
+together" (see models/recommendations.py). Fill that afterwards with
+`flask --app app rebuild-recommendations`. Safe to run more than once.
+
+Usage: python database/migrate_order_item_product_id.py [path/to/store.db] [path/to/products.json]
+"""
+import json
+import os
+import sqlite3
+import sys
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DB = os.path.join(ROOT, "instance", "store.db")
+DEFAULT_CATALOG = os.path.join(ROOT, "products.json")
+
+
+def migrate(path, catalog_path):
+    with open(catalog_path) as f:
+        products = json.load(f)
+    names = Counter(product["name"] for product in products)
+    ids = {product["name"]: product["id"] for product in products if names[product["name"]] == 1}
+
+    conn = sqlite3.connect(path)
+    with conn:
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(order_items)")]
+        if "product_id" not in columns:
+            conn.execute("ALTER TABLE order_items ADD COLUMN product_id INTEGER")
+            print("order_items.product_id added")
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_order_items_product_id ON order_items (product_id)")
+
+        filled = 0
+        for name, product_id in ids.items():
+            filled += conn.execute(
+                "UPDATE order_items SET product_id = ? WHERE product_name = ? AND product_id IS NULL",
+                (product_id, name),
+            ).rowcount
+        left = conn.execute("SELECT COUNT(*) FROM order_items WHERE product_id IS NULL").fetchone()[0]
+        print(f"product_id: backfilled {filled} items, {left} without a catalog match")
+
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS co_purchases ("
+            "  product_id INTEGER NOT NULL,"
+            "  other_id INTEGER NOT NULL,"
+            "  orders INTEGER NOT NULL,"
+            "  PRIMARY KEY (product_id, other_id)"
+            ")"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_co_purchases_top ON co_purchases (product_id, orders)")
+    conn.close()
+
+
+if __name__ == "__main__":
+    migrate(
+        sys.argv[1] if len(sys.argv) > 1 else DEFAULT_DB,
+        sys.argv[2] if len(sys.argv) > 2 else DEFAULT_CATALOG,
+    )
@@ -0,0 +1,29 @@
+"""Add orders.payment_key (checkout idempotency key), in place.
+
+New tables (such as inventory) are created by db.create_all(); this
+only covers the column added to the existing orders table. Safe to run
+more than once.
+
+Usage: python database/migrate_order_payment_key.py [path/to/store.db]
+"""
+import os
+import sqlite3
+import sys
+
+DEFAULT_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "instance", "store.db")
+
+
+def migrate(path):
+    conn = sqlite3.connect(path)
+    with conn:
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(orders)")]
+        if "payment_key" not in columns:
+            conn.execute("ALTER TABLE orders ADD COLUMN payment_key VARCHAR(64)")
+            print("orders.payment_key added")
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS uq_orders_payment_key ON orders (payment_key)")
+        print("unique index uq_orders_payment_key ready")
+    conn.close()
+
+
+if __name__ == "__main__":
+    migrate(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_DB)
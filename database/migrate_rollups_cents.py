@@ -0,0 +1,55 @@
+"""Move the analytics rollups to integer cents, in place.
+
+The rollup tables (see models/rollups.py) used to keep revenue as a
+float in euros; they now keep revenue_cents. Rollups are derived data,
+so the tables are recreated and filled from the orders, the same way
+`flask --app app rebuild-rollups` does. Run migrate_order_cents.py
+first. Safe to run more than once.
+
+Usage: python database/migrate_rollups_cents.py [path/to/store.db]
+"""
+import os
+import sqlite3
+import sys
+
+DEFAULT_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "instance", "store.db")
+
+TABLES = {
+    "rollup_daily_revenue": (
+        "day DATE NOT NULL PRIMARY KEY",
+        "SELECT order_date, COUNT(id), COALESCE(SUM(subtotal_cents), 0) FROM orders"
+        " WHERE order_date IS NOT NULL GROUP BY order_date",
+    ),
+    "rollup_status_totals": (
+        "status VARCHAR(50) NOT NULL PRIMARY KEY",
+        "SELECT status, COUNT(id), COALESCE(SUM(subtotal_cents), 0) FROM orders"
+        " WHERE status IS NOT NULL GROUP BY status",
+    ),
+    "rollup_product_sales": (
+        "product_name VARCHAR(200) NOT NULL PRIMARY KEY",
+        "SELECT product_name, SUM(quantity), SUM(CAST(ROUND(price * 100) AS INTEGER) * quantity)"
+        " FROM order_items WHERE product_name IS NOT NULL GROUP BY product_name",
+    ),
+}
+
+
+def migrate(path):
+    conn = sqlite3.connect(path)
+    with conn:
+        for table, (key, totals) in TABLES.items():
+            count = "units" if table == "rollup_product_sales" else "orders"
+            conn.execute(f"DROP TABLE IF EXISTS {table}")
+            conn.execute(
+                f"CREATE TABLE {table} ("
+                f"  {key},"
+                f"  {count} INTEGER NOT NULL,"
+                f"  revenue_cents INTEGER NOT NULL"
+                f")"
+            )
+            cursor = conn.execute(f"INSERT INTO {table} {totals}")
+            print(f"{table}: {cursor.rowcount} rows")
+    conn.close()
+
+
+if __name__ == "__main__":
+    migrate(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_DB)
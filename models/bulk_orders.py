@@ -0,0 +1,130 @@
+import csv
+from itertools import islice
+
+from sqlalchemy import delete, select, update
+
+from . import db
+from .order import Order, OrderItem, ORDER_STATUSES, UNSETTLED
+from .recommendations import remove_baskets
+from .rollups import move_status, remove_orders
+
+
+def _chunks(values, size):
+    values = iter(values)
+    while chunk := list(islice(values, size)):
+        yield chunk
+
+
+def settled(order_ids):
+    """The orders among `order_ids` whose payment has been settled, i.e.
+    the ones an admin or a courier file may change."""
+    return db.session.scalars(
+        select(Order.id).where(Order.id.in_(order_ids), Order.status.not_in(UNSETTLED))
+    ).all()
+
+
+def bulk_update_status(order_ids, status, batch_size=1000):
+    """Set `status` on every order in `order_ids`; one UPDATE per batch.
+
+    Orders still waiting on their payment (UNSETTLED) are left alone.
+    Returns the ids of the orders updated. The caller commits; the
+    status rollup is updated in the same transaction.
+    """
+    if status not in ORDER_STATUSES:
+        raise ValueError(f"Unknown status: {status}")
+    changed = []
+    for chunk in _chunks(order_ids, batch_size):
+        chunk = settled(chunk)
+        if not chunk:
+            continue
+        move_status(chunk, status)
+        db.session.execute(
+            update(Order)
+            .where(Order.id.in_(chunk), Order.status.not_in(UNSETTLED))
+            .values(status=status)
+            .execution_options(synchronize_session=False)
+        )
+        changed.extend(chunk)
+    return changed
+
+
+def bulk_delete(order_ids, batch_size=1000):
+    """Delete orders and their items without loading them, and take them
+    out of the rollups and the co-purchase counts. The caller commits."""
+    deleted = 0
+    for chunk in _chunks(order_ids, batch_size):
+        remove_orders(chunk)
+        remove_baskets(chunk)
+        db.session.execute(
+            delete(OrderItem)
+            .where(OrderItem.order_id.in_(chunk))
+            .execution_options(synchronize_session=False)
+        )
+        result = db.session.execute(
+            delete(Order)
+            .where(Order.id.in_(chunk))
+            .execution_options(synchronize_session=False)
+        )
+        deleted += result.rowcount
+    return deleted
+
+
+class ImportResult:
+    def __init__(self):
+        self.rows = 0
+        self.updated = 0
+        self.rejected = []  # (line number, reason), first few only
+
+
+def import_statuses(lines, batch_size=1000, on_batch=None, max_rejected=20):
+    """Apply a courier status file: CSV rows of `order_id,status`.
+
+    Rows are read lazily and applied `batch_size` at a time, each batch
+    in its own transaction, so memory use does not grow with the file.
+    A header row and blank lines are skipped; bad rows are counted and
+    reported, not fatal. Rows for orders still waiting on their payment
+    are skipped. `on_batch(status, order_ids)` runs after each batch
+    commits with the orders it updated, e.g. to update caches.
+    """
+    result = ImportResult()
+
+    def reject(line_number, reason):
+        if len(result.rejected) < max_rejected:
+            result.rejected.append((line_number, reason))
+
+    def flush(batch):
+        by_status = {}
+        for order_id, status in batch.items():
+            by_status.setdefault(status, []).append(order_id)
+        for status, order_ids in by_status.items():
+            by_status[status] = bulk_update_status(order_ids, status, batch_size)
+            result.updated += len(by_status[status])
+        db.session.commit()
+        if on_batch:
+            for status, order_ids in by_status.items():
+                on_batch(status, order_ids)
+
+    batch = {}  # order_id -> status; a later row for the same order wins
+    reader = csv.reader(lines)
+    for row in reader:
+        if not row or not "".join(row).strip():
+            continue
+        if reader.line_num == 1 and not row[0].strip().isdigit():
+            continue  # header
+        result.rows += 1
+        if len(row) < 2 or not row[0].strip().isdigit():
+            reject(reader.line_num, "expected order_id,status")
+            continue
+        status = row[1].strip()
+        if status not in ORDER_STATUSES:
+            reject(reader.line_num, f"unknown status {status!r}")
+            continue
+
+        batch[int(row[0])] = status
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = {}
+
+    if batch:
+        flush(batch)
+    return result
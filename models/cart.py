@@ -1,50 +1,97 @@
+from .pricing import to_cents, totals_for
+
+
 class Cart:
-    def __init__(self):
+    def __init__(self, store=None, key=None):
         # items stored as {product_id: {"product": obj, "qty": int}}
         self.items = {}
+        # running sum of price * qty in cents, kept in step with items
+        self.subtotal_cents = 0
+        # optional CartStore every change is applied to
+        self.store = store
+        self.key = key
+        # catalog products by id, to look up items other requests added
+        self.products = {}
 
-    def adds(self, product):
-        if product.id in self.items:
-            self.items[product.id]["qty"] += 1
+    @classmethod
+    def load(cls, store, key, products):
+        cart = cls(store, key)
+        cart.products = products
+        cart._sync(store.load(key))
+        return cart
+
+    def _sync(self, stored, product=None):
+        # Take the stored {product_id: qty}, which also has the changes
+        # other requests made to this cart in the meantime. Only lines
+        # whose quantity changed are priced into the running subtotal.
+        for product_id in self.items.keys() - stored.keys():
+            item = self.items.pop(product_id)
+            self.subtotal_cents -= to_cents(item["product"].price) * item["qty"]
+        for product_id, qty in stored.items():
+            item = self.items.get(product_id)
+            if item is None:
+                known = self.products.get(product_id)
+                if known is None and product is not None and product.id == product_id:
+                    known = product
+                if known is None:
+                    continue  # no longer in the catalog
+                item = self.items[product_id] = {"product": known, "qty": 0}
+            if qty != item["qty"]:
+                self.subtotal_cents += to_cents(item["product"].price) * (qty - item["qty"])
+                item["qty"] = qty
+
+    def _update(self, product, delta):
+        # The single place quantities change. With a store, the change is
+        # one atomic read-modify-write of the stored cart, so concurrent
+        # requests for the same user never lose each other's updates.
+        # delta=None drops the item.
+        def change(stored):
+            qty = stored.get(product.id, 0) + delta if delta is not None else 0
+            if qty > 0:
+                stored[product.id] = qty
+            else:
+                stored.pop(product.id, None)
+            return stored
+
+        if self.store is not None:
+            stored = self.store.update(self.key, change)
         else:
-            self.items[product.id] = {"product": product, "qty": 1}
+            stored = change({product_id: item["qty"] for product_id, item in self.items.items()})
+        self._sync(stored, product)
+
+    def adds(self, product):
+        self.add(product, 1)
     
     
     def add(self, product, quantity=1):
-        product_id = product.id
-
-        if product_id in self.items:
-            self.items[product_id]["qty"] += quantity
-        else:
-            self.items[product_id] = {
-                "product": product,
-                "qty": quantity
-            }
+        self._update(product, quantity)
 
     
 
     def remove(self, product_id):
         if product_id in self.items:
-            del self.items[product_id]
+            self._update(self.items[product_id]["product"], None)
 
     def increase(self, product_id):
         if product_id in self.items:
-            self.items[product_id]["qty"] += 1
+            self._update(self.items[product_id]["product"], 1)
 
     def decrease(self, product_id):
         if product_id in self.items:
-            self.items[product_id]["qty"] -= 1
-            if self.items[product_id]["qty"] <= 0:
-                del self.items[product_id]
+            self._update(self.items[product_id]["product"], -1)
 
     def clear(self):
         self.items = {}
+        self.subtotal_cents = 0
+        if self.store is not None:
+            self.store.delete(self.key)
+
+    def totals(self):
+        """Subtotal, VAT and total in cents, without walking the items."""
+        return totals_for(self.subtotal_cents)
 
     def total(self):
-        return sum(
-            item["product"].price * item["qty"]
-            for item in self.items.values()
-        )
+        return self.subtotal_cents / 100
 
     def list_items(self):
         return [
@@ -0,0 +1,164 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+
+class CartStore(ABC):
+    """Keeps each user's cart as a plain {product_id: qty} mapping."""
+
+    @abstractmethod
+    def load(self, key):
+        pass
+
+    @abstractmethod
+    def save(self, key, items):
+        pass
+
+    @abstractmethod
+    def delete(self, key):
+        pass
+
+    @abstractmethod
+    def update(self, key, change):
+        """Replace the stored items with `change(items)` and return them,
+        as one atomic step: concurrent updates of a cart are applied one
+        after the other, never lost."""
+
+
+class MemoryCartStore(CartStore):
+    """In-process LRU store. Carts expire after `ttl` seconds of inactivity."""
+
+    def __init__(self, max_entries=10000, ttl=7 * 24 * 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._carts = OrderedDict()  # key -> (expires_at, items)
+        self._lock = threading.Lock()
+
+    def load(self, key):
+        with self._lock:
+            entry = self._carts.get(key)
+            if entry is None:
+                return {}
+            expires_at, items = entry
+            if expires_at < time.monotonic():
+                del self._carts[key]
+                return {}
+            self._carts.move_to_end(key)
+            return dict(items)
+
+    def save(self, key, items):
+        if not items:
+            self.delete(key)
+            return
+        with self._lock:
+            self._carts[key] = (time.monotonic() + self.ttl, dict(items))
+            self._carts.move_to_end(key)
+            while len(self._carts) > self.max_entries:
+                self._carts.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._carts.pop(key, None)
+
+    def update(self, key, change):
+        with self._lock:
+            entry = self._carts.get(key)
+            items = dict(entry[1]) if entry and entry[0] >= time.monotonic() else {}
+            items = change(items)
+            if items:
+                self._carts[key] = (time.monotonic() + self.ttl, dict(items))
+                self._carts.move_to_end(key)
+                while len(self._carts) > self.max_entries:
+                    self._carts.popitem(last=False)
+            else:
+                self._carts.pop(key, None)
+            return dict(items)
+
+
+class SQLiteCartStore(CartStore):
+    """Shared store on a SQLite file, usable from several worker processes."""
+
+    PURGE_EVERY = 500  # saves between expired-cart sweeps
+
+    def __init__(self, path, ttl=7 * 24 * 3600, timeout=10):
+        self.path = path
+        self.ttl = ttl
+        self.timeout = timeout
+        self._local = threading.local()
+        self._saves = 0
+
+    def _conn(self):
+        # One connection per thread, opened on first use (so none is made
+        # before a preloading server forks) and re-opened after a fork
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS carts ("
+                " cart_key TEXT PRIMARY KEY,"
+                " items TEXT NOT NULL,"
+                " updated_at REAL NOT NULL)"
+            )
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _read(self, conn, key):
+        row = conn.execute(
+            "SELECT items, updated_at FROM carts WHERE cart_key = ?", (str(key),)
+        ).fetchone()
+        if row is None or row[1] + self.ttl < time.time():
+            return {}
+        return {int(product_id): qty for product_id, qty in json.loads(row[0]).items()}
+
+    def _write(self, conn, key, items):
+        if not items:
+            conn.execute("DELETE FROM carts WHERE cart_key = ?", (str(key),))
+            return
+        now = time.time()
+        conn.execute(
+            "INSERT INTO carts (cart_key, items, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(cart_key) DO UPDATE SET items = excluded.items, updated_at = excluded.updated_at",
+            (str(key), json.dumps(items), now),
+        )
+        self._saves += 1
+        if self._saves % self.PURGE_EVERY == 0:
+            conn.execute("DELETE FROM carts WHERE updated_at < ?", (now - self.ttl,))
+
+    def load(self, key):
+        return self._read(self._conn(), key)
+
+    def save(self, key, items):
+        self._write(self._conn(), key, items)
+
+    def delete(self, key):
+        self._conn().execute("DELETE FROM carts WHERE cart_key = ?", (str(key),))
+
+    def update(self, key, change):
+        # BEGIN IMMEDIATE takes the write lock before reading, so a
+        # concurrent update of the same cart waits and then sees this one
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            items = change(self._read(conn, key))
+            self._write(conn, key, items)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return dict(items)
+
+
+def create_cart_store(config, instance_path):
+    if config.get("CART_STORE") == "memory":
+        return MemoryCartStore(max_entries=config["CART_MAX_ENTRIES"], ttl=config["CART_TTL"])
+    # A relative path is in the instance folder, like the app database's
+    path = os.path.join(instance_path, config["CART_STORE_PATH"])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return SQLiteCartStore(path, ttl=config["CART_TTL"])
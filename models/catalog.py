@@ -0,0 +1,151 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections.abc import Mapping, Sequence
+from types import MappingProxyType
+from typing import NamedTuple
+
+from .product import PhysicalProduct, DigitalProduct, SubscriptionProduct
+from .catalog_index import CatalogIndex
+from .catalog_file import MappedCatalog
+
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogSnapshot(NamedTuple):
+    """One immutable, fully-loaded version of the catalog."""
+    version: str              # content hash, identical in every worker
+    products: Mapping         # {product_id: Product}
+    product_list: Sequence    # products in file order
+    index: CatalogIndex       # search / filter / sort structures
+    mtime: float
+
+
+def parse_products(data):
+    product_objects = {}
+    for p in data:
+        rating = p.get("rating", 0)  # default 0 if not set
+        if p["type"] == "physical":
+            obj = PhysicalProduct(p["id"], p["name"], p["price"], p["image"], rating)
+        elif p["type"] == "digital":
+            obj = DigitalProduct(p["id"], p["name"], p["price"], p["image"], rating)
+        else:
+            obj = SubscriptionProduct(p["id"], p["name"], p["price"], p["image"], rating)
+
+        product_objects[p["id"]] = obj
+
+    return product_objects
+
+
+def load_snapshot(path):
+    mtime = os.stat(path).st_mtime
+
+    if path.endswith(".bin"):
+        # Compact columnar file (see catalog_file.py), shared via mmap
+        products = MappedCatalog(path)
+        return CatalogSnapshot(
+            version=products.version,
+            products=products,
+            product_list=products.rows,
+            index=CatalogIndex(products.rows, products.columns()),
+            mtime=mtime,
+        )
+
+    with open(path, "rb") as f:
+        raw = f.read()
+
+    products = parse_products(json.loads(raw))
+    product_list = tuple(products.values())
+    return CatalogSnapshot(
+        version=hashlib.sha1(raw).hexdigest()[:12],
+        products=MappingProxyType(products),
+        product_list=product_list,
+        index=CatalogIndex(product_list),
+        mtime=mtime,
+    )
+
+
+class CatalogManager:
+    """Holds the current catalog snapshot and swaps in new ones.
+
+    The file's mtime is checked at most every `check_interval` seconds;
+    when it changes the file is parsed on a background thread and the
+    new snapshot replaces the old one in a single assignment. Readers
+    that already hold a snapshot keep using it unchanged.
+
+    The first snapshot is loaded on first use, not on construction.
+    """
+
+    def __init__(self, path, check_interval=2.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._snapshot = None
+        self._next_check = time.monotonic() + check_interval
+        self._reload_lock = threading.Lock()
+        self._reloading = False
+
+    @property
+    def current(self):
+        if self._snapshot is None:
+            return self._load()
+        self._maybe_reload()
+        return self._snapshot
+
+    @property
+    def version(self):
+        return self.current.version
+
+    def _load(self):
+        with self._reload_lock:
+            if self._snapshot is None:
+                self._snapshot = load_snapshot(self.path)
+                self._next_check = time.monotonic() + self.check_interval
+            return self._snapshot
+
+    def reload(self):
+        """Parse the file now and swap it in. Returns the active snapshot."""
+        with self._reload_lock:
+            current = self._snapshot
+            try:
+                snapshot = load_snapshot(self.path)
+            except (OSError, ValueError, KeyError) as e:
+                logger.error("Catalog reload from %s failed, keeping version %s: %s",
+                             self.path, current and current.version, e)
+                raise
+            if current is None or snapshot.version != current.version:
+                logger.info("Catalog reloaded: version %s", snapshot.version)
+            else:
+                # File touched but unchanged: keep the existing objects
+                snapshot = current._replace(mtime=snapshot.mtime)
+            self._snapshot = snapshot
+            return snapshot
+
+    def reload_async(self):
+        if self._reloading:
+            return
+        self._reloading = True
+        threading.Thread(target=self._background_reload, daemon=True).start()
+
+    def _background_reload(self):
+        try:
+            self.reload()
+        except (OSError, ValueError, KeyError):
+            pass
+        finally:
+            self._reloading = False
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            return
+        if mtime != self._snapshot.mtime:
+            self.reload_async()
@@ -0,0 +1,183 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping, Sequence
+
+from .catalog_index import Columns
+from .product import PhysicalProduct, DigitalProduct, SubscriptionProduct
+
+
+# Columnar catalog file, meant to be memory-mapped read-only so every
+# worker process shares the same pages.
+#
+#   header   magic, format version, product count, catalog version
+#   columns  ids, prices, ratings, sorted_ids, id_rows, name and image
+#            offsets, types -- each 8-byte aligned, native byte order
+#   strings  UTF-8 names followed by image file names
+#
+# Rows are kept in products.json order; sorted_ids/id_rows give an
+# O(log n) lookup by product id without building a dict per worker.
+
+MAGIC = b"MCAT"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHxxI16s")
+
+TYPE_NAMES = ("physical", "digital", "subscription")
+TYPE_CLASSES = (PhysicalProduct, DigitalProduct, SubscriptionProduct)
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+def _layout(count):
+    sections = [
+        ("ids", "q", count),
+        ("prices", "d", count),
+        ("ratings", "d", count),
+        ("sorted_ids", "q", count),
+        ("id_rows", "I", count),
+        ("name_offsets", "I", count + 1),
+        ("image_offsets", "I", count + 1),
+        ("types", "B", count),
+    ]
+    layout = {}
+    offset = _align(HEADER.size)
+    for name, fmt, n in sections:
+        layout[name] = (offset, fmt, n)
+        offset = _align(offset + struct.calcsize(fmt) * n)
+    return layout, offset
+
+
+def write_catalog_file(json_path, path):
+    """Convert products.json into the columnar format at `path`."""
+    with open(json_path, "rb") as f:
+        raw = f.read()
+    data = json.loads(raw)
+    count = len(data)
+
+    columns = {
+        "ids": array("q", (p["id"] for p in data)),
+        "prices": array("d", (p["price"] for p in data)),
+        "ratings": array("d", (p.get("rating", 0) for p in data)),
+        # unknown types load as subscriptions, as in parse_products()
+        "types": array("B", (
+            TYPE_NAMES.index(p["type"]) if p["type"] in TYPE_NAMES else 2 for p in data
+        )),
+    }
+    id_rows = sorted(range(count), key=lambda row: data[row]["id"])
+    columns["sorted_ids"] = array("q", (data[row]["id"] for row in id_rows))
+    columns["id_rows"] = array("I", id_rows)
+
+    strings = bytearray()
+    for field in ("name", "image"):
+        offsets = array("I")
+        for p in data:
+            offsets.append(len(strings))
+            strings += (p.get(field) or "").encode()
+        offsets.append(len(strings))
+        columns[f"{field}_offsets"] = offsets
+
+    layout, strings_start = _layout(count)
+    version = hashlib.sha1(raw).hexdigest()[:12]
+
+    # Write to a temp file and rename: workers that still map the old
+    # file keep reading it until they pick up the new one
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, count, version.encode()))
+        for name, (offset, fmt, n) in layout.items():
+            column = columns[name]
+            assert column.itemsize == struct.calcsize(fmt) and len(column) == n
+            f.write(b"\0" * (offset - f.tell()))
+            f.write(column.tobytes())
+        f.write(b"\0" * (strings_start - f.tell()))
+        f.write(strings)
+    os.replace(tmp_path, path)
+    return count
+
+
+class MappedCatalog(Mapping):
+    """Read-only {product_id: Product} view over a memory-mapped catalog file.
+
+    Product objects are built on access and not kept, so a worker only
+    holds the pages it actually touches.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+
+        magic, format_version, count, version = HEADER.unpack_from(view)
+        if magic != MAGIC or format_version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} catalog file")
+        self.version = version.rstrip(b"\0").decode()
+        self._count = count
+
+        layout, strings_start = _layout(count)
+        for name, (offset, fmt, n) in layout.items():
+            size = struct.calcsize(fmt) * n
+            setattr(self, f"_{name}", view[offset:offset + size].cast(fmt))
+        self._strings = view[strings_start:]
+        self.rows = MappedRows(self)
+
+    def name(self, row):
+        names = self._name_offsets
+        return bytes(self._strings[names[row]:names[row + 1]]).decode()
+
+    def columns(self):
+        """Index columns (see catalog_index.py), read straight off the map."""
+        return Columns(
+            names=(self.name(row) for row in range(self._count)),
+            types=self._types,
+            type_names=TYPE_NAMES,
+            prices=self._prices,
+            ratings=self._ratings,
+        )
+
+    def product(self, row):
+        images = self._image_offsets
+        name = self.name(row)
+        image = bytes(self._strings[images[row]:images[row + 1]]).decode()
+        rating = self._ratings[row]
+        if rating.is_integer():
+            rating = int(rating)
+        return TYPE_CLASSES[self._types[row]](
+            self._ids[row], name, self._prices[row], image or None, rating
+        )
+
+    def __getitem__(self, product_id):
+        i = bisect_left(self._sorted_ids, product_id)
+        if i == self._count or self._sorted_ids[i] != product_id:
+            raise KeyError(product_id)
+        return self.product(self._id_rows[i])
+
+    def __iter__(self):
+        return iter(self._ids)
+
+    def __len__(self):
+        return self._count
+
+
+class MappedRows(Sequence):
+    """The catalog's products in file order, as a sequence."""
+
+    def __init__(self, catalog):
+        self._catalog = catalog
+
+    def __len__(self):
+        return len(self._catalog)
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self._catalog.product(i) for i in range(*row.indices(len(self)))]
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError(row)
+        return self._catalog.product(row)
@@ -0,0 +1,217 @@
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import islice
+from typing import Iterable, NamedTuple, Sequence
+
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+SORTS = ("default", "price_asc", "price_desc", "rating")
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+def product_type(product):
+    # "PhysicalProduct" -> "physical"
+    return type(product).__name__[:-len("Product")].lower()
+
+
+class Columns(NamedTuple):
+    """What the index needs to know about the products, by position."""
+    names: Iterable[str]
+    types: Sequence[int]        # positions in type_names
+    type_names: Sequence[str]
+    prices: Sequence[float]
+    ratings: Sequence[float]
+
+
+def product_columns(products):
+    """Columns read off a sequence of product objects."""
+    type_names = []
+    types = array("B")
+    for product in products:
+        name = product_type(product)
+        if name not in type_names:
+            type_names.append(name)
+        types.append(type_names.index(name))
+    return Columns(
+        names=[product.name for product in products],
+        types=types,
+        type_names=tuple(type_names),
+        prices=array("d", (product.price for product in products)),
+        ratings=array("d", (product.rating for product in products)),
+    )
+
+
+class CatalogIndex:
+    """Search, filter and sort structures over one catalog snapshot.
+
+    Products are referred to by their position in catalog order, kept in
+    compact arrays rather than lists of Python ints. The index holds:
+      * an inverted index from name tokens to positions,
+      * positions grouped by product type,
+      * positions sorted by price and by rating, with the sort keys
+        kept alongside so ranges can be found with bisect.
+
+    `search` picks the smallest candidate source for the filters given
+    and, when that source is already in the requested order, stops as
+    soon as the page is filled, so a query never has to walk the whole
+    catalog unless the filters genuinely match most of it.
+
+    Building and filtering only read the columns; product objects are
+    made just for the page returned. A memory-mapped catalog passes its
+    own columns, so a worker indexing it builds no product objects and
+    keeps reading prices, ratings and types from the shared pages.
+    """
+
+    def __init__(self, products, columns=None):
+        # Any sequence: a tuple of products or a memory-mapped MappedRows
+        self.products = products
+        positions = range(len(self.products))
+        if columns is None:
+            columns = product_columns(products)
+        self._types = columns.types
+        self._type_names = columns.type_names
+        self._prices = prices = columns.prices
+        self._ratings = ratings = columns.ratings
+
+        postings = {}
+        for pos, name in enumerate(columns.names):
+            for token in set(tokenize(name)):
+                postings.setdefault(token, []).append(pos)
+        self._postings = {token: array("I", p) for token, p in postings.items()}
+        self._vocabulary = sorted(self._postings)
+
+        by_type = {}
+        for pos in positions:
+            by_type.setdefault(self._types[pos], []).append(pos)
+        self._by_type = {self._type_names[code]: array("I", p) for code, p in by_type.items()}
+
+        by_price = sorted(positions, key=lambda pos: (prices[pos], pos))
+        self._price_order = array("I", by_price)
+        self._price_keys = array("d", (prices[pos] for pos in by_price))
+
+        # Highest rating first; keys are negated so bisect still works
+        by_rating = sorted(positions, key=lambda pos: (-ratings[pos], pos))
+        self._rating_order = array("I", by_rating)
+        self._rating_keys = array("d", (-ratings[pos] for pos in by_rating))
+
+    @property
+    def types(self):
+        return sorted(self._by_type)
+
+    def search(self, q=None, kind=None, min_price=None, max_price=None,
+               min_rating=None, sort="default", offset=0, limit=6):
+        """Return (products, has_more) for one page of results."""
+        if sort not in SORTS:
+            sort = "default"
+
+        # Candidate sources as (positions, the sort they are already in)
+        n = len(self.products)
+        full_order = {
+            "default": (_Slice(range(n), 0, n), "default"),
+            "price_asc": (_Slice(self._price_order, 0, n), "price_asc"),
+            "price_desc": (_Slice(self._price_order, 0, n), "price_asc"),
+            "rating": (_Slice(self._rating_order, 0, n), "rating"),
+        }
+        sources = [full_order[sort]]
+
+        text_matches = self._match_text(q) if q else None
+        if text_matches is not None:
+            if not text_matches:
+                return [], False
+            sources.append((text_matches, None))
+        if kind is not None:
+            sources.append((self._by_type.get(kind, ()), "default"))
+        if min_price is not None or max_price is not None:
+            lo = 0 if min_price is None else bisect_left(self._price_keys, min_price)
+            hi = n if max_price is None else bisect_right(self._price_keys, max_price)
+            sources.append((_Slice(self._price_order, lo, hi), "price_asc"))
+        if min_rating is not None:
+            hi = bisect_right(self._rating_keys, -min_rating)
+            sources.append((_Slice(self._rating_order, 0, hi), "rating"))
+
+        # Walk the smallest source; on a tie prefer one already in order
+        wanted = "price_asc" if sort == "price_desc" else sort
+        positions, ordered_for = min(
+            sources, key=lambda source: (len(source[0]), source[1] != wanted)
+        )
+        if positions is text_matches:
+            text_matches = None  # already restricted to the text matches
+
+        types, prices, ratings = self._types, self._prices, self._ratings
+        kind_code = self._type_names.index(kind) if kind in self._type_names else -1
+
+        def matches(pos):
+            return (
+                (kind is None or types[pos] == kind_code)
+                and (min_price is None or prices[pos] >= min_price)
+                and (max_price is None or prices[pos] <= max_price)
+                and (min_rating is None or ratings[pos] >= min_rating)
+                and (text_matches is None or pos in text_matches)
+            )
+
+        if ordered_for == wanted:
+            if sort == "price_desc":
+                positions = reversed(positions)
+            # Stream in order and stop once the page (+1 for has_more) is full
+            hits = islice(filter(matches, positions), offset, offset + limit + 1)
+            page = [self.products[pos] for pos in hits]
+        else:
+            # Smallest source is not in the requested order: filter, then sort
+            hits = sorted(filter(matches, positions), key=self._sort_key(sort))
+            page = [self.products[pos] for pos in hits[offset:offset + limit + 1]]
+
+        return page[:limit], len(page) > limit
+
+    def _match_text(self, q):
+        """Positions whose names have a word starting with every query token.
+
+        Returns None when the query has no searchable tokens.
+        """
+        result = None
+        for token in sorted(set(tokenize(q)), key=len, reverse=True):
+            lo = bisect_left(self._vocabulary, token)
+            hi = bisect_left(self._vocabulary, token + "\uffff", lo)
+            found = set()
+            for word in self._vocabulary[lo:hi]:
+                found.update(self._postings[word])
+            result = found if result is None else result & found
+            if not result:
+                break
+        return result
+
+    def _sort_key(self, sort):
+        prices, ratings = self._prices, self._ratings
+        if sort == "price_asc":
+            return lambda pos: (prices[pos], pos)
+        if sort == "price_desc":
+            return lambda pos: (-prices[pos], -pos)
+        if sort == "rating":
+            return lambda pos: (-ratings[pos], pos)
+        return lambda pos: pos
+
+
+class _Slice:
+    """A lazy [lo:hi] view of a sequence, with a cheap len()."""
+
+    __slots__ = ("seq", "lo", "hi")
+
+    def __init__(self, seq, lo, hi):
+        self.seq, self.lo, self.hi = seq, lo, hi
+
+    def __len__(self):
+        return max(self.hi - self.lo, 0)
+
+    def __iter__(self):
+        seq = self.seq
+        for i in range(self.lo, self.hi):
+            yield seq[i]
+
+    def __reversed__(self):
+        seq = self.seq
+        for i in range(self.hi - 1, self.lo - 1, -1):
+            yield seq[i]
@@ -0,0 +1,167 @@
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import current_app
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+
+# Named engine settings, picked with DB_PROFILE. Pool settings apply to
+# every backend; the sqlite_* ones are PRAGMAs run on each new SQLite
+# connection. Single values can still be overridden from the environment
+# (see DB_OVERRIDES in config.py).
+PROFILES = {
+    "default": {
+        "pool_size": 5,
+        "max_overflow": 10,
+        "pool_timeout": 30,
+        "pool_recycle": 1800,
+        "sqlite_journal_mode": "WAL",  # readers never block the writer
+        "sqlite_busy_timeout": 5000,  # ms a writer waits for the lock
+        "sqlite_synchronous": "NORMAL",  # fsync at checkpoints, safe with WAL
+    },
+    # Every commit fsynced: slower writes, nothing lost on power failure
+    "durable": {
+        "sqlite_synchronous": "FULL",
+    },
+    # Many worker threads sharing one database
+    "high-concurrency": {
+        "pool_size": 20,
+        "max_overflow": 20,
+        "sqlite_busy_timeout": 15000,
+    },
+}
+
+POOL_OPTIONS = ("pool_size", "max_overflow", "pool_timeout", "pool_recycle")
+WRITES = ("INSERT", "UPDATE", "DELETE", "REPLACE")  # statements the driver opens a transaction for
+
+
+def resolve_profile(name, overrides=None):
+    if name not in PROFILES:
+        raise ValueError(f"Unknown DB_PROFILE {name!r}, expected one of {', '.join(PROFILES)}")
+    settings = dict(PROFILES["default"], **PROFILES[name])
+    settings.update({key: value for key, value in (overrides or {}).items() if value is not None})
+    return settings
+
+
+def engine_options(uri, settings):
+    url = make_url(uri)
+    if url.get_backend_name() != "sqlite":
+        options = {key: settings[key] for key in POOL_OPTIONS}
+        options["pool_pre_ping"] = True
+        return options
+    if url.database in (None, "", ":memory:"):
+        return {}  # single shared connection (StaticPool), nothing to tune
+    options = {key: settings[key] for key in POOL_OPTIONS}
+    # Same wait in the driver as in the busy_timeout PRAGMA
+    options["connect_args"] = {"timeout": settings["sqlite_busy_timeout"] / 1000}
+    return options
+
+
+def install_sqlite_pragmas(engine, settings):
+    if engine.dialect.name != "sqlite":
+        return
+    read_only = engine.url.query.get("mode") == "ro"
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        # Read-only (mode=ro) connections cannot switch the journal mode
+        if not read_only:
+            cursor.execute(f"PRAGMA journal_mode={settings['sqlite_journal_mode']}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings['sqlite_busy_timeout'])}")
+        cursor.execute(f"PRAGMA synchronous={settings['sqlite_synchronous']}")
+        cursor.close()
+        # The driver opens a transaction at the first INSERT/UPDATE/DELETE
+        # (reads before it take no lock); make that BEGIN IMMEDIATE, so the
+        # write lock is waited for when the transaction starts instead of
+        # being upgraded to halfway through it
+        if not read_only:
+            dbapi_connection.isolation_level = "IMMEDIATE"
+
+    if not read_only:
+        queue_writers(engine, settings["sqlite_busy_timeout"] / 1000)
+
+
+def queue_writers(engine, timeout):
+    """Hand `engine`'s write transactions the database in turn.
+
+    SQLite has one writer at a time, and its busy handler polls with
+    growing sleeps: with many threads a waiting writer can keep losing
+    the lock to newer ones until busy_timeout runs out. This process's
+    writers queue on a lock instead (for at most `timeout` seconds);
+    only writers in other processes are left to busy_timeout.
+    """
+    writer = threading.Lock()
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def acquire(conn, cursor, statement, parameters, context, executemany):
+        if "writer" in conn.info or cursor.connection.in_transaction:
+            return
+        if statement.lstrip()[:7].upper().startswith(WRITES) and writer.acquire(timeout=timeout):
+            conn.info["writer"] = True
+
+    @event.listens_for(engine, "commit")
+    @event.listens_for(engine, "rollback")
+    def release(conn):
+        if conn.info.pop("writer", False):
+            writer.release()
+
+    @event.listens_for(engine, "invalidate")
+    def release_invalidated(dbapi_connection, connection_record, exception):
+        if connection_record.info.pop("writer", False):
+            writer.release()
+
+
+def init_database(app, db):
+    """db.init_app(app) with the DB_PROFILE engine settings and, if
+    READ_DATABASE_URI is set, a "read" bind for read_only() sessions."""
+    settings = resolve_profile(app.config["DB_PROFILE"], app.config["DB_OVERRIDES"])
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(app.config["SQLALCHEMY_DATABASE_URI"], settings)
+    if app.config["READ_DATABASE_URI"]:
+        app.config.setdefault("SQLALCHEMY_BINDS", {})["read"] = {
+            "url": app.config["READ_DATABASE_URI"],
+            **engine_options(app.config["READ_DATABASE_URI"], settings),
+        }
+
+    db.init_app(app)
+    with app.app_context():
+        for engine in db.engines.values():
+            install_sqlite_pragmas(engine, settings)
+
+
+class RoutingSession(Session):
+    """Session that sends reads to the "read" bind while marked read-only.
+
+    Outside `read_only()`, or while flushing, everything goes to the
+    primary database as usual.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self.info.get("read_only") and not self._flushing:
+            read_engine = self._db.engines.get("read")
+            if read_engine is not None:
+                return read_engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@contextmanager
+def read_only(session):
+    previous = session.info.get("read_only", False)
+    session.info["read_only"] = True
+    try:
+        yield
+    finally:
+        session.info["read_only"] = previous
+
+
+def read_only_view(func):
+    """Decorator for views that only read: their queries may use the replica."""
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with read_only(current_app.extensions["sqlalchemy"].session()):
+            return func(*args, **kwargs)
+    return wrapper
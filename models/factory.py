@@ -0,0 +1,80 @@
+import threading
+
+from flask.cli import AppGroup
+
+
+class Views:
+    """Routes, template helpers and CLI commands, declared at import time
+    and added to each app made by create_app().
+
+    Works like a Blueprint, except that endpoints keep their plain names,
+    so url_for("index") and friends stay as they are.
+    """
+
+    def __init__(self):
+        self.cli = AppGroup()
+        self._deferred = []  # callables that take the app
+
+    def route(self, rule, **options):
+        def decorator(func):
+            self._deferred.append(lambda app: app.add_url_rule(rule, view_func=func, **options))
+            return func
+        return decorator
+
+    def context_processor(self, func):
+        self._deferred.append(lambda app: app.context_processor(func))
+        return func
+
+    def template_filter(self, name=None):
+        def decorator(func):
+            self._deferred.append(lambda app: app.add_template_filter(func, name))
+            return func
+        return decorator
+
+    def template_global(self, name=None):
+        def decorator(func):
+            self._deferred.append(lambda app: app.add_template_global(func, name))
+            return func
+        return decorator
+
+    def register(self, app):
+        for register in self._deferred:
+            register(app)
+        for command in self.cli.commands.values():
+            app.cli.add_command(command)
+
+
+def subsystem(build):
+    """Property that calls `build` on first access and keeps the result.
+
+    Unlike functools.cached_property it holds a lock while building, so
+    requests racing for a new subsystem all get the same instance. The
+    owner needs `_built` (a dict) and `_lock` (an RLock) attributes.
+    """
+    name = build.__name__
+
+    def get(self):
+        try:
+            return self._built[name]
+        except KeyError:
+            with self._lock:
+                if name not in self._built:
+                    self._built[name] = build(self)
+                return self._built[name]
+
+    get.subsystem = True
+    return property(get, doc=build.__doc__)
+
+
+class Subsystems:
+    """Base for a set of lazily built `subsystem` properties."""
+
+    def __init__(self):
+        self._built = {}
+        self._lock = threading.RLock()  # a subsystem may be built from another one
+
+    def build_all(self):
+        for cls in type(self).__mro__:
+            for name, value in vars(cls).items():
+                if isinstance(value, property) and getattr(value.fget, "subsystem", False):
+                    getattr(self, name)
@@ -0,0 +1,105 @@
+import hashlib
+import os
+import threading
+
+
+# Bounding boxes for each place an image is shown, in pixels
+SIZES = {
+    "card": (330, 300),     # index.html product cards
+    "detail": (440, 400),   # product_detail.html
+    "thumb": (160, 160),    # cart, my orders, order success (shown at 60-80px)
+}
+
+FORMATS = {
+    "webp": ("WEBP", "webp", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", "jpg", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+PLACEHOLDER = "placeholder.png"
+
+
+class ImagePipeline:
+    """Builds resized, content-hashed copies of the product images.
+
+    Derivatives are created on first use (or ahead of time with
+    `build_all`) and written next to each other in `output_dir`, named
+    `<stem>-<size>-<hash>.<ext>` so they can be cached forever.
+    """
+
+    def __init__(self, source_dir, output_dir):
+        self.source_dir = source_dir
+        self.output_dir = output_dir
+        self._manifest = {}  # (filename, size, fmt) -> (source mtime, derived name)
+        self._lock = threading.Lock()
+        os.makedirs(output_dir, exist_ok=True)
+
+    def derivative(self, filename, size, fmt="jpeg"):
+        """Return the file name of the derivative, building it if needed."""
+        source = os.path.join(self.source_dir, filename or PLACEHOLDER)
+        if not os.path.isfile(source):
+            filename = PLACEHOLDER
+            source = os.path.join(self.source_dir, PLACEHOLDER)
+
+        key = (filename, size, fmt)
+        mtime = os.stat(source).st_mtime
+        cached = self._manifest.get(key)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+        with self._lock:
+            name = self._build(source, size, fmt)
+            self._manifest[key] = (mtime, name)
+        return name
+
+    def build_all(self, filenames):
+        built = []
+        for filename in set(filenames):
+            for size in SIZES:
+                for fmt in FORMATS:
+                    built.append(self.derivative(filename, size, fmt))
+        return built
+
+    def _build(self, source, size, fmt):
+        pil_format, ext, options = FORMATS[fmt]
+        width, height = SIZES[size]
+
+        with open(source, "rb") as f:
+            data = f.read()
+        digest = hashlib.sha1(data)
+        digest.update(f"{width}x{height}:{fmt}:{sorted(options.items())}".encode())
+
+        stem = os.path.splitext(os.path.basename(source))[0]
+        name = f"{stem}-{size}-{digest.hexdigest()[:12]}.{ext}"
+        path = os.path.join(self.output_dir, name)
+        if os.path.exists(path):
+            return name
+
+        # Pillow is only needed when a derivative is missing
+        from PIL import Image, ImageOps
+
+        with Image.open(source) as img:
+            img = ImageOps.exif_transpose(img)
+            img.thumbnail((width, height), Image.LANCZOS)
+            if pil_format == "JPEG":
+                img = _flatten(img)
+            elif img.mode not in ("RGB", "RGBA"):
+                img = img.convert("RGBA")
+
+            # Write then rename, so other workers never serve a partial file
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            img.save(tmp_path, pil_format, **options)
+            os.replace(tmp_path, path)
+
+        return name
+
+
+def _flatten(img):
+    # JPEG has no alpha channel: paste transparent images onto white
+    from PIL import Image
+
+    if img.mode in ("RGBA", "LA", "P"):
+        img = img.convert("RGBA")
+        background = Image.new("RGB", img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel("A"))
+        return background
+    return img.convert("RGB")
@@ -0,0 +1,65 @@
+from sqlalchemy import case, select, update
+from . import db
+
+
+class Inventory(db.Model):
+    __tablename__ = "inventory"
+
+    # Products without a row here are not stock-tracked (unlimited)
+    product_id = db.Column(db.Integer, primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+
+
+class OutOfStock(Exception):
+    def __init__(self, product_ids):
+        super().__init__(f"Not enough stock for products {product_ids}")
+        self.product_ids = product_ids
+
+
+def reserve_stock(quantities):
+    """Take `quantities` ({product_id: qty}) out of stock in the current transaction.
+
+    A single conditional UPDATE (quantity >= qty, per product) reserves
+    them all, so concurrent checkouts never oversell and it costs one
+    statement of the write transaction, however big the cart. Raises
+    OutOfStock listing every product that could not be reserved; the
+    caller must then roll back.
+    """
+    if not quantities:
+        return
+    wanted = case(quantities, value=Inventory.product_id)
+    reserved = db.session.scalars(
+        update(Inventory)
+        .where(Inventory.product_id.in_(quantities), Inventory.quantity >= wanted)
+        .values(quantity=Inventory.quantity - wanted)
+        .returning(Inventory.product_id)
+        .execution_options(synchronize_session=False)
+    ).all()
+    missed = set(quantities) - set(reserved)
+    if missed:
+        # Products without an inventory row are not short, just untracked
+        short = db.session.scalars(
+            select(Inventory.product_id).where(Inventory.product_id.in_(missed))
+        ).all()
+        if short:
+            raise OutOfStock(sorted(short))
+
+
+def release_stock(quantities):
+    """Put reserved quantities back, e.g. after a failed payment."""
+    if not quantities:
+        return
+    db.session.execute(
+        update(Inventory)
+        .where(Inventory.product_id.in_(quantities))
+        .values(quantity=Inventory.quantity + case(quantities, value=Inventory.product_id))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def set_stock(product_id, quantity):
+    row = db.session.get(Inventory, product_id)
+    if row is None:
+        db.session.add(Inventory(product_id=product_id, quantity=quantity))
+    else:
+        row.quantity = quantity
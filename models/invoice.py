@@ -0,0 +1,161 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import cache
+from io import BytesIO
+
+from .order import DATE_FORMAT
+from .pricing import format_cents, to_cents
+
+
+@cache
+def style_sheet():
+    """The shared style sheet; rendering only reads from it.
+
+    ReportLab is the slowest import in the app, so it is loaded here on
+    the first invoice (or by warm_up()) rather than when the app starts.
+    """
+    from reportlab.lib.styles import getSampleStyleSheet
+    return getSampleStyleSheet()
+
+
+def render_invoice(order):
+    """Render the invoice for `order` and return the PDF as bytes."""
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib import colors
+
+    styles = style_sheet()
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    elements = []
+
+    # --- Store Info ---
+    elements.append(Paragraph("<b>Mini Store</b><sup>™</sup>", styles["Title"]))
+    elements.append(Paragraph("123 Commerce Street", styles["Normal"]))
+    elements.append(Paragraph("Berlin, Germany", styles["Normal"]))
+    elements.append(Paragraph("Email: support@ministore.com", styles["Normal"]))
+    elements.append(Spacer(1, 15))
+
+    # --- Invoice Header ---
+    elements.append(Paragraph(f"<b>Invoice</b>", styles["Heading1"]))
+    elements.append(Paragraph(f"Invoice Number: {order.id}", styles["Normal"]))
+    elements.append(Paragraph(f"Order Date: {order.order_date:{DATE_FORMAT}}", styles["Normal"]))
+    elements.append(Spacer(1, 10))
+
+    # --- Customer / Shipping ---
+    elements.append(Paragraph("<b>Bill To:</b>", styles["Heading3"]))
+    elements.append(Paragraph(order.address, styles["Normal"]))
+    elements.append(Paragraph(f"{order.city}, {order.zip_code}", styles["Normal"]))
+    elements.append(Paragraph(order.country, styles["Normal"]))
+    elements.append(Spacer(1, 15))
+
+    # --- Item Table ---
+    table_data = [
+        ["Item", "Qty", "Unit Price (€)", "Total (€)"]
+    ]
+
+    for item in order.items:
+        unit_price = to_cents(item.price)
+
+        table_data.append([
+            item.product_name,
+            str(item.quantity),
+            format_cents(unit_price),
+            format_cents(unit_price * item.quantity)
+        ])
+
+    # --- Totals rows: as stored at checkout ---
+    totals = order.totals
+    table_data.append(["", "", "Subtotal:", format_cents(totals.subtotal)])
+    table_data.append(["", "", "VAT (10%):", format_cents(totals.vat)])
+    table_data.append(["", "", "Total:", format_cents(totals.total)])
+
+    table = Table(table_data, colWidths=[220, 60, 100, 100])
+    table.setStyle(TableStyle([
+        ("BACKGROUND", (0, 0), (-1, 0), colors.grey),
+        ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke),
+        ("GRID", (0, 0), (-1, -1), 1, colors.black),
+        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+        ("ALIGN", (1, 1), (-1, -1), "CENTER"),
+        ("ALIGN", (2, 1), (-1, -1), "RIGHT"),
+        ("BACKGROUND", (0, -1), (-1, -1), colors.lightgrey),
+        ("FONTNAME", (0, -1), (-1, -1), "Helvetica-Bold"),
+    ]))
+
+    elements.append(table)
+    elements.append(Spacer(1, 20))
+
+    # --- Payment & Delivery ---
+    elements.append(Paragraph(f"<b>Payment Method:</b> {order.payment_method}", styles["Normal"]))
+    elements.append(Paragraph(f"<b>Delivery Company:</b> {order.delivery_company}", styles["Normal"]))
+    elements.append(Spacer(1, 15))
+
+    # --- Footer ---
+    elements.append(Paragraph(
+        "Thank you for shopping with Mini Store.",
+        styles["Italic"]
+    ))
+
+    doc.build(elements)
+
+    return buffer.getvalue()
+
+
+def invoice_key(order):
+    """Fingerprint of everything printed on the invoice, plus the order status."""
+    parts = [
+        order.id, order.status, order.order_date, order.address, order.city,
+        order.zip_code, order.country, order.payment_method, order.delivery_company,
+        order.totals,
+    ]
+    for item in order.items:
+        parts.extend((item.product_name, item.price, item.quantity))
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+class InvoiceCache:
+    """LRU cache of rendered PDFs, bounded by their total size in bytes."""
+
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()  # order_id -> (key, pdf)
+        self._lock = threading.Lock()
+
+    def get(self, order):
+        key = invoice_key(order)
+        with self._lock:
+            entry = self._entries.get(order.id)
+            if entry is None or entry[0] != key:
+                return None
+            self._entries.move_to_end(order.id)
+            return entry[1]
+
+    def put(self, order, pdf):
+        if len(pdf) > self.max_bytes:
+            return
+        key = invoice_key(order)
+        with self._lock:
+            self._discard(order.id)
+            self._entries[order.id] = (key, pdf)
+            self.size += len(pdf)
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def invalidate(self, order_id):
+        with self._lock:
+            self._discard(order_id)
+
+    def get_or_render(self, order):
+        pdf = self.get(order)
+        if pdf is None:
+            pdf = render_invoice(order)
+            self.put(order, pdf)
+        return pdf
+
+    def _discard(self, order_id):
+        entry = self._entries.pop(order_id, None)
+        if entry is not None:
+            self.size -= len(entry[1])
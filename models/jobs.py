@@ -0,0 +1,226 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+from sqlalchemy import delete, or_, select, update
+
+from . import db
+
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+DEAD = "dead"
+
+
+class Job(db.Model):
+    __tablename__ = "jobs"
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default="{}")
+    status = db.Column(db.String(10), nullable=False, default=PENDING)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at = db.Column(db.Float, nullable=False)  # epoch seconds
+    locked_until = db.Column(db.Float)  # lease of the worker running it
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.Float, nullable=False)
+
+    __table_args__ = (db.Index("ix_jobs_status_run_at", "status", "run_at"),)
+
+
+class JobQueue:
+    """Durable background jobs, stored in the app database.
+
+    `enqueue` adds a job to the current session, so it commits (or rolls
+    back) together with the data it is about. Worker threads claim due
+    jobs with a conditional UPDATE, so several threads or processes can
+    share the table. A claimed job holds a lease; if its worker dies the
+    job becomes due again when the lease runs out. Failed jobs are
+    retried with exponential backoff; after `max_attempts` they are kept
+    as dead letters (status "dead") until requeued.
+
+    Worker threads start with the first request each process serves (so
+    also again in forked server workers), and jobs left from before a
+    restart run without waiting for new ones. With `workers=0` nothing
+    runs in the web process and `flask run-jobs` does the work instead.
+    """
+
+    def __init__(self, workers=2, poll_interval=1.0, lease=300, backoff=5, max_backoff=3600,
+                 max_attempts=5, retention=24 * 3600):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_attempts = max_attempts
+        self.retention = retention
+        self.handlers = {}
+        self._app = None
+        self._threads = []
+        self._pid = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._claims = 0
+
+    def task(self, kind):
+        """Register the decorated function as the handler for `kind` jobs."""
+
+        def decorator(func):
+            self.handlers[kind] = func
+            return func
+        return decorator
+
+    def enqueue(self, kind, payload=None, delay=0):
+        if kind not in self.handlers:
+            raise ValueError(f"No handler registered for job kind {kind!r}")
+        now = time.time()
+        job = Job(
+            kind=kind,
+            payload=json.dumps(payload or {}),
+            status=PENDING,
+            attempts=0,
+            max_attempts=self.max_attempts,
+            run_at=now + delay,
+            created_at=now,
+        )
+        db.session.add(job)
+        return job
+
+    # ---------- Workers ----------
+
+    def init_app(self, app):
+        """Take the JOB_* settings from `app` and run jobs in its context."""
+        self._app = app
+        self.workers = app.config["JOB_WORKERS"]
+        self.poll_interval = app.config["JOB_POLL_INTERVAL"]
+        self.lease = app.config["JOB_LEASE"]
+        self.backoff = app.config["JOB_RETRY_BACKOFF"]
+        self.max_backoff = app.config["JOB_RETRY_MAX_BACKOFF"]
+        self.max_attempts = app.config["JOB_MAX_ATTEMPTS"]
+        self.retention = app.config["JOB_RETENTION"]
+        # CLI commands serve no requests, so they start no workers
+        app.before_request(self.start)
+
+    def start(self):
+        """Start this process's worker threads, unless they are running."""
+        if self.workers and self._pid != os.getpid():
+            self._start()
+
+    def wake(self):
+        """Tell the workers new jobs were committed, starting them if needed."""
+        self.start()
+        self._wake.set()
+
+    def _start(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._threads = [
+                threading.Thread(target=self._work, name=f"job-worker-{n}", daemon=True)
+                for n in range(self.workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        self._pid = None
+
+    def _work(self):
+        while not self._stop.is_set():
+            try:
+                with self._app.app_context():
+                    ran = self.run_one()
+            except Exception:
+                logger.exception("Job worker failed to claim a job")
+                ran = False
+            if not ran:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def run_one(self):
+        """Claim and run one due job. Returns False if none was due."""
+        job = self._claim()
+        if job is None:
+            return False
+
+        try:
+            self.handlers[job.kind](json.loads(job.payload))
+        except Exception as e:
+            db.session.rollback()
+            self._failed(job, e)
+        else:
+            db.session.execute(update(Job).where(Job.id == job.id).values(status=DONE, locked_until=None))
+            db.session.commit()
+        return True
+
+    def _claim(self):
+        now = time.time()
+        due = or_(
+            (Job.status == PENDING) & (Job.run_at <= now),
+            (Job.status == RUNNING) & (Job.locked_until < now),  # lease expired
+        )
+        while True:
+            job = db.session.execute(select(Job).where(due).order_by(Job.run_at).limit(1)).scalar()
+            if job is None:
+                db.session.rollback()
+                return None
+            # Only one worker's UPDATE can still match the row
+            claimed = db.session.execute(
+                update(Job)
+                .where(Job.id == job.id, due)
+                .values(status=RUNNING, locked_until=now + self.lease, attempts=Job.attempts + 1)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            db.session.commit()
+            if claimed:
+                self._claims += 1
+                if self._claims % 1000 == 0:
+                    self._purge()
+                db.session.refresh(job)
+                return job
+
+    def _failed(self, job, error):
+        if job.attempts >= job.max_attempts:
+            values = {"status": DEAD, "locked_until": None}
+            logger.error("Job %s (%s) failed %d times, giving up: %s", job.id, job.kind, job.attempts, error)
+        else:
+            delay = min(self.backoff * 2 ** (job.attempts - 1), self.max_backoff)
+            delay *= random.uniform(0.8, 1.2)  # spread retries of jobs that failed together
+            values = {"status": PENDING, "locked_until": None, "run_at": time.time() + delay}
+            logger.warning("Job %s (%s) failed, retry %d in %.0fs: %s", job.id, job.kind, job.attempts, delay, error)
+        values["last_error"] = f"{type(error).__name__}: {error}"
+        db.session.execute(update(Job).where(Job.id == job.id).values(**values))
+        db.session.commit()
+
+    def _purge(self):
+        db.session.execute(delete(Job).where(Job.status == DONE, Job.created_at < time.time() - self.retention))
+        db.session.commit()
+
+    # ---------- Dead letters ----------
+
+    def counts(self):
+        rows = db.session.execute(select(Job.status, db.func.count(Job.id)).group_by(Job.status))
+        return dict(rows.all())
+
+    def requeue_dead(self):
+        """Give every dead job a fresh set of attempts. The caller commits."""
+        return db.session.execute(
+            update(Job)
+            .where(Job.status == DEAD)
+            .values(status=PENDING, attempts=0, run_at=time.time(), last_error=None)
+        ).rowcount
@@ -0,0 +1,208 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            yield bound, total
+
+
+class RequestStats:
+    __slots__ = ("started", "queries", "query_time", "statements")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.query_time = 0.0
+        self.statements = {}  # SQL text -> times run in this request
+
+
+class Metrics:
+    """Per-route request latency and per-request SQL statistics.
+
+    Requests are timed between before_request and after_request (for
+    streamed responses that excludes sending the body). SQL queries are
+    counted through engine events into the current request's stats.
+    When one statement runs `n_plus_one_threshold` times or more in a
+    single request, the request is counted and logged as a likely N+1.
+
+    Everything is kept in memory per process and rendered in the
+    Prometheus text format by `render`.
+    """
+
+    def __init__(self, n_plus_one_threshold=10):
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self._latency = {}  # (endpoint, method) -> Histogram
+        self._queries = {}  # endpoint -> Histogram of queries per request
+        self._query_seconds = {}  # endpoint -> total SQL time
+        self._responses = {}  # (endpoint, method, status) -> count
+        self._n_plus_one = {}  # endpoint -> count
+        self._gauges = []  # (name, help, callable)
+        self._lock = threading.Lock()
+
+    # ---------- Hooks ----------
+
+    def instrument(self, app, engines):
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.teardown_request(self._teardown_request)
+        for engine in engines:
+            event.listen(engine, "before_cursor_execute", self._before_query)
+            event.listen(engine, "after_cursor_execute", self._after_query)
+
+    def gauge(self, name, help, value):
+        """Export `value()` as a gauge, read at scrape time."""
+        self._gauges.append((name, help, value))
+
+    def _start_request(self):
+        g._request_stats = RequestStats()
+
+    def _finish_request(self, response):
+        self._record(response.status_code)
+        return response
+
+    def _teardown_request(self, exc):
+        # When exceptions propagate (debug, testing) after_request is skipped
+        if exc is not None:
+            self._record(500)
+
+    @staticmethod
+    def _before_query(conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and "_request_stats" in g:
+            context._query_started = time.perf_counter()
+
+    @staticmethod
+    def _after_query(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_query_started", None)
+        if started is None:
+            return
+        stats = g._request_stats
+        stats.queries += 1
+        stats.query_time += time.perf_counter() - started
+        stats.statements[statement] = stats.statements.get(statement, 0) + 1
+
+    def _record(self, status):
+        stats = g.pop("_request_stats", None)
+        if stats is None:
+            return  # already recorded
+        elapsed = time.perf_counter() - stats.started
+        endpoint = request.endpoint or "unmatched"
+        method = request.method
+
+        repeated, statement = max(((n, s) for s, n in stats.statements.items()), default=(0, None))
+        suspect = repeated >= self.n_plus_one_threshold
+
+        with self._lock:
+            key = (endpoint, method)
+            if key not in self._latency:
+                self._latency[key] = Histogram(LATENCY_BUCKETS)
+            self._latency[key].observe(elapsed)
+            if endpoint not in self._queries:
+                self._queries[endpoint] = Histogram(QUERY_COUNT_BUCKETS)
+            self._queries[endpoint].observe(stats.queries)
+            self._query_seconds[endpoint] = self._query_seconds.get(endpoint, 0.0) + stats.query_time
+            key = (endpoint, method, status)
+            self._responses[key] = self._responses.get(key, 0) + 1
+            if suspect:
+                self._n_plus_one[endpoint] = self._n_plus_one.get(endpoint, 0) + 1
+
+        if suspect:
+            logger.warning(
+                "Possible N+1 in %s: one statement ran %d times (%d queries in total): %s",
+                endpoint, repeated, stats.queries, " ".join(statement.split())[:200]
+            )
+
+    # ---------- Exposition ----------
+
+    def render(self):
+        with self._lock:
+            latency = {key: _copy(h) for key, h in self._latency.items()}
+            queries = {key: _copy(h) for key, h in self._queries.items()}
+            query_seconds = dict(self._query_seconds)
+            responses = dict(self._responses)
+            n_plus_one = dict(self._n_plus_one)
+
+        lines = []
+        _histogram(lines, "http_request_duration_seconds", "Time spent handling a request.",
+                   ("endpoint", "method"), latency)
+        _counter(lines, "http_responses_total", "Responses sent, by status code.",
+                 ("endpoint", "method", "status"), responses)
+        _histogram(lines, "db_queries_per_request", "SQL queries run by one request.",
+                   ("endpoint",), {(e,): h for e, h in queries.items()})
+        _counter(lines, "db_query_seconds_total", "Time spent in SQL queries.",
+                 ("endpoint",), {(e,): v for e, v in query_seconds.items()})
+        _counter(lines, "db_n_plus_one_requests_total",
+                 "Requests that ran one statement many times (likely N+1).",
+                 ("endpoint",), {(e,): v for e, v in n_plus_one.items()})
+        for name, help, value in self._gauges:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {_number(value())}")
+        return "\n".join(lines) + "\n"
+
+
+def _copy(histogram):
+    copy = Histogram(histogram.buckets)
+    copy.counts = list(histogram.counts)
+    copy.sum = histogram.sum
+    copy.count = histogram.count
+    return copy
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _histogram(lines, name, help, names, histograms):
+    lines.append(f"# HELP {name} {help}")
+    lines.append(f"# TYPE {name} histogram")
+    for values, histogram in sorted(histograms.items(), key=lambda item: item[0]):
+        for bound, count in histogram.cumulative():
+            lines.append(f"{name}_bucket{_labels(names, values, [('le', _number(bound))])} {count}")
+        lines.append(f"{name}_sum{_labels(names, values)} {_number(histogram.sum)}")
+        lines.append(f"{name}_count{_labels(names, values)} {histogram.count}")
+
+
+def _counter(lines, name, help, names, values):
+    lines.append(f"# HELP {name} {help}")
+    lines.append(f"# TYPE {name} counter")
+    for key, value in sorted(values.items()):
+        lines.append(f"{name}{_labels(names, key)} {_number(value)}")
@@ -1,32 +1,60 @@
 from datetime import datetime
 from . import db
+from .pricing import Totals
+
+
+# How order and delivery dates are shown to customers
+DATE_FORMAT = "%d-%m-%Y"
+
+# In the order an order moves through them
+ORDER_STATUSES = ("Confirmed", "Shipped", "Out for Delivery", "Delivered")
+CONFIRMED = ORDER_STATUSES[0]
+# Before CONFIRMED: checkout has reserved the stock but the payment's
+# outcome is not known yet. Failed payments pass through PAYMENT_FAILED
+# on their way to being deleted.
+PAYMENT_PENDING = "Payment pending"
+PAYMENT_FAILED = "Payment failed"
+# Only settle_payment() in app.py moves or deletes orders in these
+UNSETTLED = (PAYMENT_PENDING, PAYMENT_FAILED)
 
 
 class Order(db.Model):
     __tablename__ = "orders"
 
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
     address = db.Column(db.String(200))
     city = db.Column(db.String(100))
     zip_code = db.Column(db.String(20))
     country = db.Column(db.String(30))
     delivery_company = db.Column(db.String(50))
-    order_date = db.Column(db.String(50))
-    delivery_date = db.Column(db.String(50))
+    order_date = db.Column(db.Date, index=True)
+    delivery_date = db.Column(db.Date)
     payment_method = db.Column(db.String(50))
-    total = db.Column(db.Float)
-    status = db.Column(db.String(50), default="Confirmed")
+    total = db.Column(db.Float)  # net amount in euros, as charged
+    # Totals fixed at checkout (models/pricing.py); pages show these
+    subtotal_cents = db.Column(db.Integer)
+    vat_cents = db.Column(db.Integer)
+    total_cents = db.Column(db.Integer)
+    status = db.Column(db.String(50), default=CONFIRMED, index=True)
+    # Idempotency key of the checkout that created the order
+    payment_key = db.Column(db.String(64), unique=True)
 
     user = db.relationship("User", back_populates="orders")
     items = db.relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
 
+    @property
+    def totals(self):
+        return Totals(self.subtotal_cents, self.vat_cents, self.total_cents)
+
 
 class OrderItem(db.Model):
     __tablename__ = "order_items"
 
     id = db.Column(db.Integer, primary_key=True)
-    order_id = db.Column(db.Integer, db.ForeignKey("orders.id"), nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey("orders.id"), nullable=False, index=True)
+    # Catalog id; NULL on items older than the column that had no match
+    product_id = db.Column(db.Integer, index=True)
 
     product_name = db.Column(db.String(200))
     price = db.Column(db.Float)
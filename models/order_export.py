@@ -0,0 +1,92 @@
+import csv
+import io
+import json
+import zlib
+
+from sqlalchemy import select
+
+from . import db
+from .order import Order, OrderItem
+
+
+ORDER_COLUMNS = (
+    "order_id", "order_date", "delivery_date", "status", "user_id", "payment_method",
+    "delivery_company", "address", "city", "zip_code", "country", "total",
+    "subtotal_cents", "vat_cents", "total_cents"
+)
+ITEM_COLUMNS = ("product_name", "price", "quantity")
+
+CSV_FLUSH_ROWS = 500  # rows per chunk handed to the response
+
+
+def export_rows(status=None, date_from=None, date_to=None, chunk_size=1000):
+    """Yield one row per order item (orders without items get one row).
+
+    Rows come from a server-side cursor `chunk_size` at a time, ordered
+    by order id so all rows of an order are adjacent.
+    """
+    stmt = (
+        select(
+            Order.id.label("order_id"), Order.order_date, Order.delivery_date, Order.status,
+            Order.user_id, Order.payment_method, Order.delivery_company, Order.address,
+            Order.city, Order.zip_code, Order.country, Order.total,
+            Order.subtotal_cents, Order.vat_cents, Order.total_cents,
+            OrderItem.product_name, OrderItem.price, OrderItem.quantity
+        )
+        .outerjoin(OrderItem, OrderItem.order_id == Order.id)
+        .order_by(Order.id, OrderItem.id)
+        .execution_options(yield_per=chunk_size)
+    )
+    if status:
+        stmt = stmt.where(Order.status == status)
+    if date_from:
+        stmt = stmt.where(Order.order_date >= date_from)
+    if date_to:
+        stmt = stmt.where(Order.order_date <= date_to)
+
+    result = db.session.execute(stmt)
+    try:
+        yield from result
+    finally:
+        result.close()
+
+
+def _plain(value):
+    return value.isoformat() if hasattr(value, "isoformat") else value
+
+
+def to_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(ORDER_COLUMNS + ITEM_COLUMNS)
+    for n, row in enumerate(rows, 1):
+        writer.writerow([_plain(value) for value in row])
+        if n % CSV_FLUSH_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def to_ndjson(rows):
+    """One JSON object per order, with its items nested."""
+    order = None
+    for row in rows:
+        if order is None or order["order_id"] != row.order_id:
+            if order is not None:
+                yield json.dumps(order) + "\n"
+            order = {name: _plain(row._mapping[name]) for name in ORDER_COLUMNS}
+            order["items"] = []
+        if row.product_name is not None:
+            order["items"].append({name: row._mapping[name] for name in ITEM_COLUMNS})
+    if order is not None:
+        yield json.dumps(order) + "\n"
+
+
+def gzip_chunks(chunks, level=6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,57 @@
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class HashingBusy(Exception):
+    """Too many password hashes are queued; the caller should back off."""
+
+
+class PasswordHasher:
+    """Runs Werkzeug's (deliberately slow) password hashing in worker processes.
+
+    At most `workers + max_pending` hashes may be in flight; beyond that
+    `hash` and `verify` raise HashingBusy at once instead of queueing, so
+    a burst of logins cannot pile up behind the pool. With workers=0
+    hashing runs inline, which is handy for scripts and debugging.
+    """
+
+    def __init__(self, workers=2, max_pending=32, timeout=10):
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(workers + max_pending) if workers else None
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password)
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusy("Password hashing queue is full")
+        try:
+            future = self._pool().submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # Freed when the hash is done, not when we stop waiting for it:
+        # a timed-out hash still occupies a worker
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            raise HashingBusy("Password hashing timed out")
+
+    def _pool(self):
+        # Started on first use, so importing the app stays cheap
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
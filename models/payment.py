@@ -1,4 +1,31 @@
+import asyncio
+import random
+import threading
+import time
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+
+class PaymentError(Exception):
+    pass
+
+
+class PaymentDeclined(PaymentError):
+    pass
+
+
+class PaymentTimeout(PaymentError):
+    """No answer in time. The outcome is unknown: the call keeps running
+    and may still succeed, so wait on `future` before settling."""
+
+    def __init__(self, message, future):
+        super().__init__(message)
+        self.future = future
+
+
+class GatewayUnavailable(PaymentError):
+    """The circuit breaker is open or the gateway queue is full."""
+
 
 class PaymentMethod(ABC):
     @abstractmethod
@@ -19,8 +46,177 @@ class PayPal(PaymentMethod):
 class Bitcoin(PaymentMethod):
     def pay(self, amount):
         return f"Paid €{amount} with Bitcoin."
-        
+
 
 class BankTransfer(PaymentMethod):
     def pay(self, amount):
         return f"Paid €{amount} by Bank Transfer."
+
+
+class StubGateway(PaymentMethod):
+    """Wraps a method with simulated network latency and random declines."""
+
+    def __init__(self, method, latency=0.2, jitter=0.1, failure_rate=0.0):
+        self.method = method
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+
+    def pay(self, amount):
+        time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+        if random.random() < self.failure_rate:
+            raise PaymentDeclined("Payment declined by gateway (simulated)")
+        return self.method.pay(amount)
+
+
+class CircuitBreaker:
+    """Stops calling a gateway after `failure_threshold` failures in a row.
+
+    Once open, calls fail fast for `reset_timeout` seconds; then a single
+    trial call is let through and its outcome closes or re-opens it.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class PaymentGateway:
+    """Runs a PaymentMethod's blocking pay() off the request thread.
+
+    Calls go to a shared, bounded executor and are waited on with a
+    per-gateway timeout. Submits carrying the same idempotency key get
+    the original call's future back, so a retried submit never charges
+    twice. A CircuitBreaker makes calls fail fast while the gateway is
+    unhealthy; it learns each call's outcome when the call finishes, so a
+    call that times out counts once, as whatever it turns out to be.
+    """
+
+    def __init__(self, method, executor, timeout=10, breaker=None, idempotency_ttl=3600):
+        self.method = method
+        self.executor = executor
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+        self.idempotency_ttl = idempotency_ttl
+        self._calls = {}  # idempotency key -> (expires_at, future)
+        self._lock = threading.Lock()
+
+    def submit(self, amount, idempotency_key=None):
+        with self._lock:
+            if idempotency_key is not None:
+                self._expire()
+                call = self._calls.get(idempotency_key)
+                if call is not None:
+                    return call[1]
+
+            if not self.breaker.allow():
+                raise GatewayUnavailable("Payment gateway temporarily unavailable")
+            future = self.executor.submit(self.method.pay, amount)
+            future.add_done_callback(self._record_outcome)
+            if idempotency_key is not None:
+                self._calls[idempotency_key] = (time.monotonic() + self.idempotency_ttl, future)
+            return future
+
+    def pay(self, amount, idempotency_key=None):
+        future = self.submit(amount, idempotency_key)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            raise PaymentTimeout(f"No answer from payment gateway within {self.timeout}s", future)
+
+    async def pay_async(self, amount, idempotency_key=None):
+        call = self.submit(amount, idempotency_key)
+        try:
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(call)), self.timeout)
+        except asyncio.TimeoutError:
+            raise PaymentTimeout(f"No answer from payment gateway within {self.timeout}s", call)
+
+    def _record_outcome(self, future):
+        if future.exception() is None:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+    def _expire(self):
+        now = time.monotonic()
+        expired = [key for key, (expires_at, _) in self._calls.items() if expires_at < now]
+        for key in expired:
+            del self._calls[key]
+
+
+class BoundedExecutor:
+    """ThreadPoolExecutor that refuses work once `max_queue` calls are waiting."""
+
+    def __init__(self, max_workers=8, max_queue=64):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="payment")
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+
+    def submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise GatewayUnavailable("Too many payments in progress, please retry")
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+
+def create_gateways(config):
+    methods = {
+        "credit/debit card": CreditCard(),
+        "paypal": PayPal(),
+        "bitcoin": Bitcoin(),
+        "bank transfer": BankTransfer()
+    }
+    if config["PAYMENT_STUB"]:
+        methods = {
+            key: StubGateway(
+                method,
+                latency=config["PAYMENT_STUB_LATENCY"],
+                failure_rate=config["PAYMENT_STUB_FAILURE_RATE"]
+            )
+            for key, method in methods.items()
+        }
+
+    executor = BoundedExecutor(config["PAYMENT_WORKERS"], config["PAYMENT_QUEUE"])
+    return {
+        key: PaymentGateway(
+            method,
+            executor,
+            timeout=config["PAYMENT_TIMEOUTS"].get(key, config["PAYMENT_TIMEOUT"])
+        )
+        for key, method in methods.items()
+    }
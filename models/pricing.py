@@ -0,0 +1,35 @@
+from decimal import Decimal, ROUND_HALF_UP
+from typing import NamedTuple
+
+
+# All money is handled as integer cents; floats only at the edges
+VAT_BASIS_POINTS = 1000  # 10%
+
+
+class Totals(NamedTuple):
+    subtotal: int  # cents
+    vat: int
+    total: int
+
+
+def to_cents(amount):
+    """Euros (float, str or Decimal) to integer cents, rounding half up."""
+    return int((Decimal(str(amount)) * 100).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+
+
+def vat_for(subtotal_cents, basis_points=VAT_BASIS_POINTS):
+    # Half-up rounding in integer arithmetic
+    return (subtotal_cents * basis_points + 5000) // 10000
+
+
+def totals_for(subtotal_cents):
+    vat = vat_for(subtotal_cents)
+    return Totals(subtotal_cents, vat, subtotal_cents + vat)
+
+
+def format_cents(cents):
+    if cents is None:
+        return ""  # orders not yet backfilled by migrate_order_cents.py
+    sign = "-" if cents < 0 else ""
+    euros, cents = divmod(abs(cents), 100)
+    return f"{sign}{euros}.{cents:02d}"
@@ -1,11 +1,15 @@
 from abc import ABC, abstractmethod
 
 class Product(ABC):
-    def __init__(self, id, name, price, image):
+    # No per-instance __dict__: large catalogs hold many of these
+    __slots__ = ("id", "name", "price", "image", "rating")
+
+    def __init__(self, id, name, price, image, rating=0):
         self.id = id
         self.name = name
         self.price = price
         self.image = image
+        self.rating = rating
 
     @abstractmethod
     def deliver(self):
@@ -13,15 +17,21 @@ class Product(ABC):
 
 
 class PhysicalProduct(Product):
+    __slots__ = ()
+
     def deliver(self):
         return f"Shipping '{self.name}'."
 
 
 class DigitalProduct(Product):
+    __slots__ = ()
+
     def deliver(self):
         return f"Download link for '{self.name}'."
 
 
 class SubscriptionProduct(Product):
+    __slots__ = ()
+
     def deliver(self):
         return f"Subscription for '{self.name}' activated."
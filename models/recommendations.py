@@ -0,0 +1,168 @@
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import aliased
+
+from . import db
+from .order import OrderItem
+
+
+# Orders with more distinct products than this are left out: they add
+# n² pairs and say little about what goes together
+MAX_BASKET = 50
+UPSERT_BATCH = 1000  # rows per multi-row upsert (3 bound parameters each)
+
+
+class CoPurchase(db.Model):
+    """Sparse co-purchase matrix: how many orders contain both products.
+
+    Stored in both directions, so the top partners of a product are one
+    index range scan.
+    """
+    __tablename__ = "co_purchases"
+
+    product_id = db.Column(db.Integer, primary_key=True)
+    other_id = db.Column(db.Integer, primary_key=True)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (db.Index("ix_co_purchases_top", "product_id", "orders"),)
+
+
+def _pair_counts(order_ids=None):
+    # (product, other product, orders with both), from the order items
+    item, other = aliased(OrderItem), aliased(OrderItem)
+    baskets = (
+        select(OrderItem.order_id)
+        .group_by(OrderItem.order_id)
+        .having(func.count(func.distinct(OrderItem.product_id)) <= MAX_BASKET)
+    )
+    if order_ids is not None:
+        baskets = baskets.where(OrderItem.order_id.in_(order_ids))
+    return (
+        select(item.product_id, other.product_id, func.count(func.distinct(item.order_id)))
+        .join(other, (other.order_id == item.order_id) & (other.product_id != item.product_id))
+        .where(item.order_id.in_(baskets))
+        .group_by(item.product_id, other.product_id)
+    )
+
+
+def _upsert(rows, sign):
+    if db.session.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as upsert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as upsert
+    for start in range(0, len(rows), UPSERT_BATCH):
+        stmt = upsert(CoPurchase).values([
+            {"product_id": product_id, "other_id": other_id, "orders": sign * n}
+            for product_id, other_id, n in rows[start:start + UPSERT_BATCH]
+        ])
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=["product_id", "other_id"],
+            set_={"orders": CoPurchase.orders + stmt.excluded.orders}
+        ))
+
+
+def add_basket(product_ids):
+    """Count one new order's products as bought together. Returns the
+    product ids touched.
+
+    Same result as add_baskets() on the order, without reading its items
+    back: checkout already has them.
+    """
+    product_ids = set(product_ids)
+    if len(product_ids) < 2 or len(product_ids) > MAX_BASKET:
+        return set()
+    _upsert([(a, b, 1) for a in product_ids for b in product_ids if a != b], 1)
+    return product_ids
+
+
+def add_baskets(order_ids, sign=1):
+    """Count the products bought together in `order_ids` into the matrix
+    (sign=-1 takes them out again). Returns the product ids touched.
+
+    Like the rollups, run in the same transaction as the change to the
+    orders: after inserting them, or before deleting them.
+    """
+    rows = db.session.execute(_pair_counts(order_ids)).all()
+    if not rows:
+        return set()
+    _upsert(rows, sign)
+
+    touched = {product_id for product_id, _, _ in rows}
+    if sign < 0:
+        # Keep the matrix sparse
+        db.session.execute(
+            delete(CoPurchase)
+            .where(CoPurchase.product_id.in_(touched), CoPurchase.orders <= 0)
+            .execution_options(synchronize_session=False)
+        )
+    return touched
+
+
+def remove_baskets(order_ids):
+    return add_baskets(order_ids, sign=-1)
+
+
+def rebuild_co_purchases():
+    """Recompute the matrix from every order. The caller commits."""
+    db.session.execute(delete(CoPurchase))
+    db.session.execute(
+        insert(CoPurchase).from_select(["product_id", "other_id", "orders"], _pair_counts())
+    )
+
+
+def load_top(product_id, k):
+    return tuple(db.session.execute(
+        select(CoPurchase.other_id)
+        .where(CoPurchase.product_id == product_id)
+        .order_by(CoPurchase.orders.desc(), CoPurchase.other_id)
+        .limit(k)
+    ).scalars())
+
+
+class Recommendations:
+    """TTL-bounded LRU of each product's top-k co-purchased products.
+
+    A product page costs a dict lookup once its entry is loaded (one
+    indexed query). Checkouts in this process invalidate the products
+    they touched; the TTL bounds how long other workers show an older
+    ranking.
+    """
+
+    def __init__(self, top_k=8, max_entries=10000, ttl=300):
+        self.top_k = top_k
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # product_id -> (expires_at, other ids)
+        self._lock = threading.Lock()
+
+    def get(self, product_id, loader=load_top):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(product_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(product_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        top = loader(product_id, self.top_k)
+        with self._lock:
+            self._entries[product_id] = (now + self.ttl, top)
+            self._entries.move_to_end(product_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return top
+
+    def invalidate(self, product_ids):
+        with self._lock:
+            for product_id in product_ids:
+                self._entries.pop(product_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
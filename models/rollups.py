@@ -0,0 +1,152 @@
+from sqlalchemy import Integer, cast, delete, func, select, true
+
+from . import db
+from .order import Order, OrderItem
+
+
+class DailyRevenue(db.Model):
+    __tablename__ = "rollup_daily_revenue"
+
+    day = db.Column(db.Date, primary_key=True)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    revenue_cents = db.Column(db.Integer, nullable=False, default=0)
+
+
+class ProductSales(db.Model):
+    __tablename__ = "rollup_product_sales"
+
+    product_name = db.Column(db.String(200), primary_key=True)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    revenue_cents = db.Column(db.Integer, nullable=False, default=0)
+
+
+class StatusTotals(db.Model):
+    __tablename__ = "rollup_status_totals"
+
+    status = db.Column(db.String(50), primary_key=True)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    revenue_cents = db.Column(db.Integer, nullable=False, default=0)
+
+
+# Revenue is summed in integer cents, so the running +/- updates stay
+# exact and always agree with rebuild()
+
+def _daily_totals():
+    return (
+        select(Order.order_date, func.count(Order.id), func.coalesce(func.sum(Order.subtotal_cents), 0))
+        .where(Order.order_date.is_not(None))
+        .group_by(Order.order_date)
+    )
+
+
+def _status_totals():
+    return (
+        select(Order.status, func.count(Order.id), func.coalesce(func.sum(Order.subtotal_cents), 0))
+        .where(Order.status.is_not(None))
+        .group_by(Order.status)
+    )
+
+
+def _product_totals():
+    return (
+        select(
+            OrderItem.product_name,
+            func.sum(OrderItem.quantity),
+            # Unit prices to whole cents first, as at checkout
+            func.sum(cast(func.round(OrderItem.price * 100), Integer) * OrderItem.quantity)
+        )
+        .where(OrderItem.product_name.is_not(None))
+        .group_by(OrderItem.product_name)
+    )
+
+
+# (table, its key and counter columns, GROUP BY that fills it, column to pick orders by)
+ROLLUPS = (
+    (DailyRevenue, ("day", "orders", "revenue_cents"), _daily_totals, Order.id),
+    (StatusTotals, ("status", "orders", "revenue_cents"), _status_totals, Order.id),
+    (ProductSales, ("product_name", "units", "revenue_cents"), _product_totals, OrderItem.order_id),
+)
+
+
+def _upsert(model, columns, stmt):
+    # "key: count += n, amount += x" for each (key, n, x) row `stmt` inserts
+    key, count, amount = columns
+    return stmt.on_conflict_do_update(
+        index_elements=[key],
+        set_={
+            count: getattr(model, count) + stmt.excluded[count],
+            amount: getattr(model, amount) + stmt.excluded[amount],
+        }
+    )
+
+
+def _insert(model):
+    if db.session.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model)
+
+
+def _add(model, columns, rows, sign):
+    # Add (key, n, x) rows with distinct keys
+    key, count, amount = columns
+    db.session.execute(_upsert(model, columns, _insert(model).values([
+        {key: key_value, count: sign * n, amount: sign * x} for key_value, n, x in rows
+    ])))
+
+
+def _add_totals(model, columns, totals, sign):
+    # Same as _add() on the rows of the `totals` GROUP BY, in one
+    # INSERT ... SELECT that never brings them back to Python
+    key_value, n, x = totals.subquery().c
+    rows = select(key_value, n * sign, x * sign).where(true())  # WHERE: SQLite's upsert-from-SELECT needs one
+    db.session.execute(_upsert(model, columns, _insert(model).from_select(list(columns), rows)))
+
+
+def add_orders(order_ids, sign=1):
+    """Count `order_ids` into the rollups (sign=-1 takes them out again).
+
+    Run in the same transaction as the change to the orders: after
+    inserting them, or before deleting them.
+    """
+    for model, columns, totals, order_column in ROLLUPS:
+        _add_totals(model, columns, totals().where(order_column.in_(order_ids)), sign)
+
+
+def remove_orders(order_ids):
+    add_orders(order_ids, sign=-1)
+
+
+def move_status(order_ids, new_status):
+    """Move `order_ids` to `new_status` in the status rollup.
+
+    Call before the UPDATE, while the old statuses can still be read.
+    """
+    columns = ("status", "orders", "revenue_cents")
+    rows = db.session.execute(
+        _status_totals().where(Order.id.in_(order_ids), Order.status != new_status)
+    ).all()
+    if rows:
+        _add(StatusTotals, columns, rows, -1)
+        moved = (new_status, sum(row[1] for row in rows), sum(row[2] for row in rows))
+        _add(StatusTotals, columns, [moved], 1)
+
+
+def status_moved(order_ids, old_status):
+    """Like move_status(), for orders already moved away from `old_status`
+    by an UPDATE (e.g. a conditional one deciding which orders move)."""
+    columns = ("status", "orders", "revenue_cents")
+    rows = db.session.execute(
+        _status_totals().where(Order.id.in_(order_ids), Order.status != old_status)
+    ).all()
+    for new_status, n, amount in rows:
+        _add(StatusTotals, columns, [(old_status, n, amount)], -1)
+        _add(StatusTotals, columns, [(new_status, n, amount)], 1)
+
+
+def rebuild():
+    """Recompute every rollup from the orders table. The caller commits."""
+    for model, columns, totals, _ in ROLLUPS:
+        db.session.execute(delete(model))
+        _add_totals(model, columns, totals(), 1)
@@ -0,0 +1,92 @@
+import base64
+import json
+
+from .catalog_index import product_type
+
+
+PRODUCT_FIELDS = ("id", "name", "type", "price", "rating", "image")
+ORDER_FIELDS = (
+    "id", "status", "order_date", "delivery_date", "total", "subtotal_cents", "vat_cents",
+    "total_cents", "payment_method", "delivery_company", "address", "city", "zip_code",
+    "country", "items"
+)
+ITEM_FIELDS = ("product_id", "product_name", "price", "quantity", "product_image")
+
+
+def parse_fields(raw, allowed):
+    """Turn a `fields=a,b` query value into a tuple of field names.
+
+    No value means every field. Raises ValueError on unknown names.
+    """
+    if not raw:
+        return allowed
+    fields = tuple(dict.fromkeys(name.strip() for name in raw.split(",") if name.strip()))
+    unknown = [name for name in fields if name not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def encode_cursor(state):
+    raw = json.dumps(state, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor, positions=()):
+    """Decode a cursor from encode_cursor(). The keys in `positions`, when
+    present, must be non-negative ints (offsets, ids)."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        state = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("Malformed cursor")
+    if not isinstance(state, dict):
+        raise ValueError("Malformed cursor")
+    for key in positions:
+        value = state.get(key, 0)
+        if type(value) is not int or value < 0:
+            raise ValueError("Malformed cursor")
+    return state
+
+
+def product_to_dict(product, fields):
+    values = {
+        "id": lambda: product.id,
+        "name": lambda: product.name,
+        "type": lambda: product_type(product),
+        "price": lambda: product.price,
+        "rating": lambda: product.rating,
+        "image": lambda: product.image,
+    }
+    return {name: values[name]() for name in fields}
+
+
+def item_to_dict(item, fields):
+    return {name: getattr(item, name) for name in fields}
+
+
+def order_to_dict(order, fields, item_fields=ITEM_FIELDS):
+    data = {}
+    for name in fields:
+        if name == "items":
+            data["items"] = [item_to_dict(item, item_fields) for item in order.items]
+        elif name in ("order_date", "delivery_date"):
+            value = getattr(order, name)
+            data[name] = value.isoformat() if value else None
+        else:
+            data[name] = getattr(order, name)
+    return data
+
+
+def stream_page(rows, serialize, next_cursor=None):
+    """Yield a `{"data": [...], "next_cursor": ...}` document piece by piece.
+
+    Each row is serialized only when the response body reaches it, so
+    neither the list of dicts nor the full JSON text is ever built.
+    """
+    yield '{"data":['
+    for n, row in enumerate(rows):
+        if n:
+            yield ","
+        yield json.dumps(serialize(row), separators=(",", ":"))
+    yield '],"next_cursor":' + json.dumps(next_cursor) + "}"
@@ -0,0 +1,116 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import NamedTuple, Optional, Tuple
+
+from sqlalchemy import select
+
+from . import db
+from .order import Order, OrderItem
+
+
+class TrackedItem(NamedTuple):
+    product_name: str
+    quantity: int
+
+
+class TrackingInfo(NamedTuple):
+    """What the public tracking page shows about an order."""
+    id: int
+    status: str
+    address: str
+    city: str
+    zip_code: str
+    country: str
+    delivery_company: str
+    delivery_date: Optional[date]
+    items: Tuple[TrackedItem, ...]
+
+
+def load_tracking(order_ids):
+    """Load TrackingInfo for many orders with a single joined query."""
+    rows = db.session.execute(
+        select(
+            Order.id, Order.status, Order.address, Order.city, Order.zip_code,
+            Order.country, Order.delivery_company, Order.delivery_date,
+            OrderItem.product_name, OrderItem.quantity
+        )
+        .outerjoin(OrderItem, OrderItem.order_id == Order.id)
+        .where(Order.id.in_(order_ids))
+        .order_by(Order.id, OrderItem.id)
+    )
+
+    orders = {}
+    items = {}
+    for row in rows:
+        if row.id not in orders:
+            orders[row.id] = row[:8]
+            items[row.id] = []
+        if row.product_name is not None:
+            items[row.id].append(TrackedItem(row.product_name, row.quantity))
+    return {
+        order_id: TrackingInfo(*fields, items=tuple(items[order_id]))
+        for order_id, fields in orders.items()
+    }
+
+
+class TrackingCache:
+    """TTL-bounded LRU of TrackingInfo, keyed by order id.
+
+    Admin changes write through (update_status / invalidate); the TTL
+    bounds how long other worker processes can serve an old status.
+    Unknown order ids are not cached, so a new order shows up at once.
+    """
+
+    def __init__(self, max_entries=50000, ttl=30):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # order_id -> (expires_at, info)
+        self._lock = threading.Lock()
+
+    def get_many(self, order_ids, loader=load_tracking):
+        """Return {order_id: TrackingInfo} for the ids that exist.
+
+        Everything not cached is fetched with one loader call.
+        """
+        now = time.monotonic()
+        found = {}
+        missing = []
+        with self._lock:
+            for order_id in order_ids:
+                entry = self._entries.get(order_id)
+                if entry is not None and entry[0] > now:
+                    self._entries.move_to_end(order_id)
+                    found[order_id] = entry[1]
+                    self.hits += 1
+                else:
+                    missing.append(order_id)
+            self.misses += len(missing)
+
+        if missing:
+            loaded = loader(missing)
+            found.update(loaded)
+            with self._lock:
+                for order_id, info in loaded.items():
+                    self._entries[order_id] = (now + self.ttl, info)
+                    self._entries.move_to_end(order_id)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return found
+
+    def get(self, order_id, loader=load_tracking):
+        return self.get_many([order_id], loader).get(order_id)
+
+    def update_status(self, order_id, status):
+        with self._lock:
+            entry = self._entries.get(order_id)
+            if entry is not None:
+                # Now known to be current, so it gets a fresh TTL
+                self._entries[order_id] = (time.monotonic() + self.ttl, entry[1]._replace(status=status))
+
+    def invalidate(self, order_id):
+        with self._lock:
+            self._entries.pop(order_id, None)